@@ -1,87 +1,333 @@
+# Only what parsing the options needs is imported before the green-thread
+# backends patch the standard library below
+import argparse
+import os
+
+def parse_args():
+    """Parse server command line options"""
+    parser = argparse.ArgumentParser(description='Reaction game server')
+    parser.add_argument('--async-mode', choices=['threading', 'eventlet', 'gevent'],
+                        default=os.environ.get('ASYNC_MODE', 'threading'),
+                        help='Socket.IO async backend (green-thread modes schedule rounds on the hub)')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--debug', action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument('--message-queue', default=os.environ.get('MESSAGE_QUEUE'),
+                        help='Pub/sub URL for cross-process emits: redis://, amqp://, kafka://, '
+                             'local://host:port or memory://')
+    parser.add_argument('--worker-id', default=os.environ.get('WORKER_ID'),
+                        help='Id of this worker in --workers')
+    parser.add_argument('--workers', default=os.environ.get('WORKERS'),
+                        help='Comma separated id=url list of every worker; lobbies are sharded across them')
+    parser.add_argument('--history-dir', default=os.environ.get('HISTORY_DIR', 'history'),
+                        help='Directory for spilled round history and snapshots (one subdirectory per lobby)')
+    parser.add_argument('--stats-db', default=os.environ.get('STATS_DB', 'stats.db'),
+                        help='SQLite file for durable per-username player stats (empty to disable)')
+    parser.add_argument('--player-count-interval', type=float,
+                        default=float(os.environ.get('PLAYER_COUNT_INTERVAL', 1.0)),
+                        help='Seconds over which player_count broadcasts are coalesced')
+    parser.add_argument('--lobby-idle-timeout', type=float, default=float(os.environ.get('LOBBY_IDLE_TIMEOUT', 300)),
+                        help='Seconds a created lobby waits for its first player before it is torn down (0 keeps it)')
+    parser.add_argument('--admin-token', default=os.environ.get('ADMIN_TOKEN'),
+                        help='Token admin endpoints (e.g. profiling) require in X-Admin-Token; unset disables them')
+    parser.add_argument('--snapshot-interval', type=float, default=float(os.environ.get('SNAPSHOT_INTERVAL', 30)),
+                        help='Seconds between lobby snapshots used for warm restarts (0 disables periodic snapshots)')
+    # Ignore options meant for whatever imported this module (e.g. a WSGI server)
+    args, _ = parser.parse_known_args()
+    return args
+
+args = parse_args()
+
+# Green-thread backends must patch the standard library before anything else is imported
+if args.async_mode == 'eventlet':
+    import eventlet
+    eventlet.monkey_patch()
+elif args.async_mode == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+
+import atexit
+import hmac
+import threading
+import time
 from flask import Flask, request, jsonify
 from flask_socketio import SocketIO, emit, join_room, leave_room
 from flask_cors import CORS
 import uuid
-from game_manager import GameManager
+from clock_sync import ClockSync
+from cluster import parse_workers
+from lobby_manager import LobbyManager
+from message_bus import make_client_manager
+import metrics
+from profiler import profiler, SamplingProfiler
+import protocol
+from round_types.result_codes import ResultCode
+from scheduler import make_scheduler
+import socket_json
+from status import StatusBoard
+from stats_store import StatsStore
 
 app = Flask(__name__)
 CORS(app)
-socketio = SocketIO(app, cors_allowed_origins="*")
 
-# Initialize game manager
-game_manager = GameManager()
-game_manager.set_socketio(socketio)
+# Route emits through a pub/sub bus when several workers serve the same clients
+socketio_options = {}
+client_manager = make_client_manager(args.message_queue)
+if client_manager is not None:
+    socketio_options['client_manager'] = client_manager
+elif args.message_queue:
+    socketio_options['message_queue'] = args.message_queue
+# Packets go through socket_json so pre-encoded round data isn't serialized again
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode=args.async_mode, json=socket_json,
+                    **socketio_options)
+
+# Player stats survive reconnects and restarts in a write-behind SQLite store
+stats_store = StatsStore(args.stats_db) if args.stats_db else None
+if stats_store is not None:
+    atexit.register(stats_store.close)
+
+# Initialize lobby manager (one game per lobby)
+lobby_manager = LobbyManager(scheduler=make_scheduler(args.async_mode),
+                             worker_id=args.worker_id,
+                             workers=parse_workers(args.workers),
+                             history_dir=args.history_dir,
+                             stats_store=stats_store,
+                             player_count_interval=args.player_count_interval,
+                             lobby_idle_timeout=args.lobby_idle_timeout)
+lobby_manager.set_socketio(socketio)
+# Keep client clock offsets fresh for latency-corrected reaction times
+lobby_manager.start_clock_sync()
+# Snapshot lobbies periodically and on exit so a restart keeps the leaderboard
+lobby_manager.start_snapshots(args.snapshot_interval)
+atexit.register(lobby_manager.save_snapshots, wait=True)
+
+def build_status(detail=False):
+    """Status served by /api/status; built only when the status board is dirty"""
+    default_lobby = lobby_manager.get_lobby(LobbyManager.DEFAULT_LOBBY_ID)
+    status = {
+        "status": "online",
+        "active_players": lobby_manager.get_player_count(),
+        "lobbies": lobby_manager.get_lobby_count(),
+        "current_round": default_lobby.get_current_round_info(),
+        "click_queue": lobby_manager.get_click_queue_stats(),
+        "clock_sync": lobby_manager.clock.get_stats(),
+        "stats_store": stats_store.get_stats() if stats_store else None
+    }
+    if detail:
+        status["lobby_stats"] = lobby_manager.get_lobby_stats()
+        status["round_types"] = lobby_manager.get_round_type_stats()
+    return status
+
+# Pre-rendered status, refreshed when players join/leave or rounds change
+status_board = StatusBoard(build_status)
+lobby_manager.on_change = status_board.mark_dirty
+
+# Process-level gauges, read when /metrics is scraped
+CONNECTED_SOCKETS = metrics.registry.gauge('clickgame_connected_sockets', 'Open Socket.IO connections')
+metrics.registry.gauge('clickgame_players', 'Registered players in every lobby',
+                       callback=lobby_manager.get_player_count)
+metrics.registry.gauge('clickgame_lobbies', 'Lobbies hosted by this worker', callback=lobby_manager.get_lobby_count)
+metrics.registry.gauge('clickgame_threads', 'Live threads in the server process', callback=threading.active_count)
+metrics.registry.gauge('clickgame_click_queue_depth', 'Clicks waiting to be processed in every lobby',
+                       callback=lambda: lobby_manager.get_click_queue_stats().get('depth', 0))
+metrics.registry.counter('clickgame_clicks_dropped_total', 'Clicks rejected because a click queue was full',
+                         callback=lambda: lobby_manager.get_click_queue_stats().get('dropped', 0))
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Metrics in the Prometheus text exposition format"""
+    return app.response_class(metrics.registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def is_admin():
+    """Whether the request carries the configured admin token"""
+    token = request.headers.get('X-Admin-Token', '')
+    return bool(args.admin_token) and hmac.compare_digest(token, args.admin_token)
+
+@app.route('/api/admin/profile', methods=['POST'])
+def profile():
+    """Sample every thread for ?seconds= (default 10) and return flamegraph
+    collapsed stacks, rooted at lobby, round type and game phase"""
+    if not is_admin():
+        return jsonify({"error": "forbidden"}), 403
+    seconds = max(0.1, min(request.args.get('seconds', 10, type=float), SamplingProfiler.MAX_DURATION))
+    interval = max(0.001, request.args.get('interval', SamplingProfiler.INTERVAL, type=float))
+    if not profiler.start(seconds, interval):
+        return jsonify({"error": "a profile is already running"}), 409
+    # Patched sleep in green-thread modes, so the hub keeps serving while we wait
+    while profiler.active:
+        time.sleep(0.1)
+    return app.response_class(profiler.collapsed(), mimetype='text/plain')
 
 @app.route('/api/status', methods=['GET'])
 def get_status():
-    """Simple status endpoint to verify server is running"""
+    """Status endpoint to verify server is running; ?detail=1 adds per-lobby and
+    per-round-type stats. Supports If-None-Match for cheap polling."""
+    detail = request.args.get('detail', '0').lower() in ('1', 'true', 'yes')
+    body, etag = status_board.get(detail)
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.max_age = 1
+    return response.make_conditional(request)
+
+@app.route('/api/lobbies', methods=['POST'])
+def create_lobby():
+    """Create a new empty lobby that players can join by id"""
+    lobby = lobby_manager.create_lobby()
+    return jsonify({"lobby_id": lobby.lobby_id}), 201
+
+@app.route('/api/lobbies/<lobby_id>/history', methods=['GET'])
+def get_lobby_history(lobby_id):
+    """Page through a lobby's finished rounds, newest first.
+    Pass the returned next_before as ?before= to get the following page."""
+    lobby = lobby_manager.get_lobby(lobby_id)
+    if lobby is None:
+        return jsonify({"error": "lobby not found"}), 404
+    before = request.args.get('before', type=int)
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+    rounds = lobby.round_history.page(before, limit)
     return jsonify({
-        "status": "online",
-        "active_players": game_manager.get_player_count(),
-        "current_round": game_manager.get_current_round_info()
+        "rounds": rounds,
+        "next_before": rounds[-1]['round_id'] if len(rounds) == limit else None
     })
 
+@app.route('/api/lobbies/<lobby_id>/history/<int:round_id>', methods=['GET'])
+def get_lobby_round(lobby_id, round_id):
+    """Get one finished round of a lobby"""
+    lobby = lobby_manager.get_lobby(lobby_id)
+    record = lobby.round_history.get_round(round_id) if lobby is not None else None
+    if record is None:
+        return jsonify({"error": "round not found"}), 404
+    return jsonify(record)
+
 @socketio.on('connect')
 def handle_connect():
     print(f"Client connected: {request.sid}")
+    CONNECTED_SOCKETS.inc()
+    # player_count updates go to this worker's clients only
+    join_room(lobby_manager.player_count_room)
 
 @socketio.on('disconnect')
 def handle_disconnect():
     print(f"Client disconnected: {request.sid}")
-    game_manager.remove_player(request.sid)
-    emit('player_count', {"count": game_manager.get_player_count()}, broadcast=True)
+    CONNECTED_SOCKETS.dec()
+    # The updated player count is broadcast by the lobby manager, coalesced
+    lobby_manager.remove_player(request.sid)
+    lobby_manager.clock.remove(request.sid)
 
 @socketio.on('register_player')
 def handle_register_player(data):
-    username = data.get('username')
+    # Usernames key the lobby's player index; anything but a non-empty string is refused
+    username = data.get('username') if isinstance(data, dict) else None
+    if not isinstance(username, str) or not username.strip():
+        emit('registration_status', {'success': False, 'error': 'invalid username'})
+        return
     player_id = request.sid
+    # Lobby ids are hashed onto workers and into history paths, so only strings are accepted
+    lobby_id = data.get('lobby_id')
+    if lobby_id is not None and not isinstance(lobby_id, str):
+        emit('registration_status', {'success': False, 'error': 'invalid lobby id'})
+        return
+    # Wire encoding requested by the client; unknown values fall back to JSON
+    encoding = data.get('protocol', protocol.JSON)
+    if encoding not in protocol.ENCODINGS:
+        encoding = protocol.JSON
+
+    # Lobbies are sharded across workers; send the client to the one hosting this lobby
+    if not lobby_manager.is_local_lobby(lobby_id):
+        owner = lobby_manager.get_lobby_owner(lobby_id)
+        emit('lobby_redirect', {'lobby_id': lobby_id, 'url': lobby_manager.workers[owner]})
+        return
 
-    # Check if username already exists
-    existing_id = game_manager.username_to_id.get(username)
+    lobby = lobby_manager.get_or_create_lobby(lobby_id)
+
+    # Check if username already exists in this lobby
+    existing_id = lobby.username_to_id.get(username)
     if existing_id:
         # Remove the old connection
-        game_manager.remove_player(existing_id)
+        lobby_manager.remove_player(existing_id)
+
+    # Leave the room of any lobby (or encoding) the player is switching away from
+    previous_lobby = lobby_manager.get_player_lobby(player_id)
+    if previous_lobby is not None:
+        leave_room(previous_lobby.get_player_room(player_id))
 
-    # Register the player with the game manager
-    success = game_manager.add_player(player_id, username)
+    # Register the player with the lobby's game manager
+    success = lobby_manager.add_player(player_id, username, lobby.lobby_id, encoding)
+    # The lobby may have been torn down and recreated while the old connection was removed
+    lobby = lobby_manager.get_player_lobby(player_id) or lobby
 
-    # Join the waiting room
-    join_room('waiting_room')
+    # Join the lobby's room for this player's encoding
+    join_room(lobby.get_player_room(player_id))
 
     # Notify the client about registration status
-    emit('registration_status', {
+    # The game state is encoded once per round phase and shared by every joining player
+    emit('registration_status', lobby.encode_for(player_id, 'registration_status', {
         'success': success,
         'player_id': player_id,
         'username': username,
-        'game_state': game_manager.get_game_state(),
-        'round_in_progress': game_manager.is_round_in_progress()
-    })
+        'lobby_id': lobby.lobby_id,
+        'game_state': lobby.get_game_state_frame(lobby.get_player_encoding(player_id)),
+        'rank': lobby.get_player_rank(player_id),
+        'round_in_progress': lobby.is_round_in_progress()
+    }))
 
-    # Broadcast updated player count
-    emit('player_count', {"count": game_manager.get_player_count()}, broadcast=True)
+    # Start estimating the client's clock offset before the first click
+    if lobby_manager.clock.sample_count(player_id) < ClockSync.WARMUP_SAMPLES:
+        emit('clock_ping', lobby_manager.clock.make_ping())
+
+    # Send the new player the current count; everyone else gets the coalesced broadcast
+    emit('player_count', {"count": lobby_manager.get_player_count()})
+
+@socketio.on('clock_pong')
+def handle_clock_pong(data):
+    """Record a clock sample; pings go back to back until the estimate has warmed up"""
+    if not isinstance(data, dict):
+        return
+    clock = lobby_manager.clock
+    if not clock.record(request.sid, data.get('t'), data.get('client')):
+        return
+    if clock.sample_count(request.sid) < ClockSync.WARMUP_SAMPLES:
+        emit('clock_ping', clock.make_ping())
 
 @socketio.on('player_click')
 def handle_player_click(data):
     player_id = request.sid
+    lobby = lobby_manager.get_player_lobby(player_id)
+    if lobby is None:
+        emit('click_result', {"success": False, "code": ResultCode.NOT_REGISTERED})
+        return
     
-    # Process the player's click in the current round
-    result = game_manager.process_player_click(player_id, data)
+    # Queue the click for the lobby's current round; the result is sent to the
+    # player once the batch it lands in has been processed
+    result = lobby.enqueue_player_click(player_id, data)
 
-    # Send back the immediate result to the player
-    emit('click_result', result)
+    # Rejected clicks (no round, queue full) get an immediate answer
+    if result is not None:
+        emit('click_result', lobby.encode_for(player_id, 'click_result', result))
 
     # If all players have clicked or the round timeout is reached,
     # the game manager will trigger the round end automatically
 
+@socketio.on('leaderboard_sync')
+def handle_leaderboard_sync():
+    """Send the full current leaderboard to a client that missed a delta"""
+    lobby = lobby_manager.get_player_lobby(request.sid)
+    if lobby is None:
+        return
+    emit('leaderboard_snapshot', lobby.get_leaderboard_snapshot_frame())
+
 @socketio.on('join_waiting_room')
 def handle_join_waiting_room():
     player_id = request.sid
-    join_room('waiting_room')
-    game_manager.set_player_ready(player_id)
+    lobby = lobby_manager.get_player_lobby(player_id)
+    if lobby is None:
+        return
+    join_room(lobby.get_player_room(player_id))
+    lobby.set_player_ready(player_id)
 
     # Check if all registered players are ready and if we should start the next round
-    if game_manager.should_start_next_round():
-        game_manager.start_next_round()
+    if lobby.should_start_next_round():
+        lobby.start_next_round()
 
 if __name__ == "__main__":
-    socketio.run(app, debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    socketio.run(app, debug=args.debug, host=args.host, port=args.port)
\ No newline at end of file
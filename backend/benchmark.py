@@ -0,0 +1,269 @@
+"""Microbenchmarks for the GameManager and round hot paths, without sockets.
+
+    python benchmark.py               # run everything and compare with the baselines
+    python benchmark.py -k end_round  # only benchmarks whose name contains end_round
+    python benchmark.py --save        # record the results as the new baselines
+
+Each benchmark times one operation (a player joining and leaving, a burst of
+clicks, scoring a round, ...) over several repeats and keeps the fastest, which
+is the least disturbed by other load on the machine (as timeit does). A
+result more than --tolerance slower than its baseline in
+benchmark_baseline.json is reported as a regression and the run exits with
+status 1. Baselines depend on the machine (and on whether NumPy is
+installed), so record them where they are checked.
+"""
+import argparse
+import gc
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+import socket_json
+from game_manager import GameManager
+from player_registry import np
+from scheduler import ScheduledCall
+from round_types.brightness import BrightnessRound
+from round_types.click_box import ClickBoxRound
+from round_types.color_change import ColorChangeRound
+from round_types.double_trouble import DoubleTroubleRound
+from round_types.tic_tac_toe import TicTacToeRound
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+ROUND_CLASSES = [ColorChangeRound, BrightnessRound, ClickBoxRound, DoubleTroubleRound, TicTacToeRound]
+
+
+class ManualScheduler:
+    """Scheduler that never fires; benchmarks drive the round phases by hand"""
+
+    def call_later(self, delay, callback, *args):
+        return ScheduledCall(time.monotonic() + delay, callback, args)
+
+    def call_soon(self, callback, *args):
+        return self.call_later(0, callback, *args)
+
+    def pending(self):
+        return 0
+
+
+class EncodingSocketIO:
+    """Stands in for Flask-SocketIO: every emit serializes its packet the way
+    the server does, so the cost of fanning events out is measured"""
+
+    def __init__(self):
+        self.packets = 0
+
+    def emit(self, event, data, room=None):
+        socket_json.dumps([event, data], separators=(',', ':'))
+        self.packets += 1
+
+
+def make_game(players, round_class=ClickBoxRound, rounds_played=0, socketio=None):
+    """Lobby with registered players; with rounds_played they all rank on the leaderboard"""
+    game = GameManager(scheduler=ManualScheduler())
+    game.round_types = [round_class]
+    game.set_socketio(socketio)
+    for index in range(players):
+        game.add_player(f'player-{index}', f'user-{index}')
+    if rounds_played:
+        for player_id in game.players:
+            game.players.restore_stats(player_id, random.uniform(0.2, 1.0), rounds_played)
+        game.leaderboard_index.rebuild(game.players.ranked_keys())
+        game._publish_leaderboard()
+    return game
+
+
+def start_round(game):
+    """Start the next round and make it active straight away"""
+    game.start_next_round()
+    game._advance_round(game.current_round_id, 'active')
+    return game.current_round
+
+
+def winning_click(current_round):
+    """Click data that scores in the current round"""
+    data = current_round.get_client_data()
+    if data['type'] == 'double_trouble':
+        return {'position': dict(data['good_position'])}
+    if data['type'] == 'tic_tac_toe':
+        row, col = current_round.winning_move
+        return {'position': {'row': row, 'col': col}}
+    return {}
+
+
+def click_all(game, player_ids, click):
+    """Queue a click from each player and drain the queue a batch at a time,
+    as the socket handlers and the scheduler would"""
+    batch_size = game.click_queue.batch_size
+    for player_id in player_ids:
+        game.enqueue_player_click(player_id, click)
+        if len(game.click_queue) >= batch_size:
+            game._drain_clicks()
+    while len(game.click_queue):
+        game._drain_clicks()
+
+
+class Benchmark:
+    """One timed operation. setup() builds fresh state before each repeat;
+    operation(state) is then timed number times in a row."""
+
+    def __init__(self, name, setup, operation, number=1, repeats=5):
+        self.name = name
+        self.setup = setup
+        self.operation = operation
+        self.number = number
+        self.repeats = repeats
+
+    def run(self):
+        """Fastest seconds per operation over the repeats"""
+        timings = []
+        for _ in range(self.repeats):
+            state = self.setup()
+            operation = self.operation
+            gc.collect()
+            gc.disable()
+            try:
+                started = time.perf_counter()
+                for _ in range(self.number):
+                    operation(state)
+                timings.append((time.perf_counter() - started) / self.number)
+            finally:
+                gc.enable()
+        return min(timings)
+
+
+def churn_benchmark(players):
+    def setup():
+        return make_game(players, rounds_played=3), itertools.count()
+
+    def operation(state):
+        game, counter = state
+        player_id = f'churn-{next(counter)}'
+        game.add_player(player_id, player_id)
+        game.remove_player(player_id)
+
+    return Benchmark(f'churn/add_remove_{players // 1000}k', setup, operation, number=10000)
+
+
+def click_burst_benchmark(round_class, players):
+    def setup():
+        game = make_game(players, round_class, socketio=EncodingSocketIO())
+        click = winning_click(start_round(game))
+        return game, list(game.players), click
+
+    def operation(state):
+        click_all(*state)
+
+    return Benchmark(f'click_burst/{round_class.__name__}_{players // 1000}k', setup, operation, repeats=20)
+
+
+def end_round_benchmark(players, repeats):
+    games = {}  # Built once; every repeat scores a new round of the same lobby
+
+    def setup():
+        game = games.get(players)
+        if game is None:
+            game = games[players] = make_game(players, rounds_played=5, socketio=EncodingSocketIO())
+        start_round(game)
+        # Half the lobby clicks, the rest get the no-click penalty
+        click_all(game, list(itertools.islice(game.players, 0, None, 2)), {})
+        return game
+
+    def operation(game):
+        game._end_round(game.current_round_id)
+
+    return Benchmark(f'end_round/{players // 1000}k', setup, operation, repeats=repeats)
+
+
+def leaderboard_benchmark(players):
+    def setup():
+        return make_game(players, rounds_played=5)
+
+    return Benchmark(f'leaderboard/top{GameManager.LEADERBOARD_SIZE}_{players // 1000}k',
+                     setup, lambda game: game._get_leaderboard(), number=1000)
+
+
+def game_state_benchmark(players):
+    def setup():
+        game = make_game(players, TicTacToeRound, rounds_played=5)
+        start_round(game)
+        return game
+
+    return Benchmark(f'game_state/in_progress_{players // 1000}k',
+                     setup, lambda game: game.get_game_state(), number=20000)
+
+
+BENCHMARKS = (
+    [churn_benchmark(10000)] +
+    [click_burst_benchmark(round_class, 1000) for round_class in ROUND_CLASSES] +
+    [end_round_benchmark(1000, 5), end_round_benchmark(10000, 5), end_round_benchmark(100000, 3),
+     leaderboard_benchmark(10000), game_state_benchmark(10000)]
+)
+
+
+def environment():
+    """What the timings depend on besides the code"""
+    return {'python': platform.python_version(), 'numpy': np is not None, 'machine': platform.machine()}
+
+
+def load_baselines(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as baseline_file:
+        data = json.load(baseline_file)
+    if data.get('environment') != environment():
+        print(f'Note: baselines were recorded with {data.get("environment")}, running with {environment()}')
+    return data.get('results', {})
+
+
+def _format_time(seconds):
+    if seconds >= 1e-3:
+        return f'{seconds * 1e3:.2f} ms'
+    return f'{seconds * 1e6:.1f} us'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='GameManager and round microbenchmarks')
+    parser.add_argument('-k', dest='keyword', default='', help='Only run benchmarks whose name contains this')
+    parser.add_argument('--save', action='store_true', help='Record the results as the new baselines')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed slowdown over the baseline before it counts as a regression')
+    args = parser.parse_args()
+
+    baselines = load_baselines(args.baseline)
+    results = {}
+    regressions = []
+    print(f'{"benchmark":<40} {"best":>10} {"baseline":>10} {"change":>8}')
+    for benchmark in BENCHMARKS:
+        if args.keyword not in benchmark.name:
+            continue
+        seconds = results[benchmark.name] = benchmark.run()
+        baseline = baselines.get(benchmark.name)
+        change = ''
+        if baseline:
+            ratio = seconds / baseline
+            change = f'{ratio - 1:+.0%}'
+            if ratio > 1 + args.tolerance:
+                regressions.append(benchmark.name)
+                change += ' !'
+        print(f'{benchmark.name:<40} {_format_time(seconds):>10} '
+              f'{_format_time(baseline) if baseline else "-":>10} {change:>8}', flush=True)
+
+    if args.save:
+        # Keep baselines of benchmarks that weren't run this time
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump({'environment': environment(), 'results': dict(baselines, **results)},
+                      baseline_file, indent=2, sort_keys=True)
+            baseline_file.write('\n')
+        print(f'Saved baselines to {args.baseline}')
+    elif regressions:
+        print(f'{len(regressions)} regression(s) over {args.tolerance:.0%}: {", ".join(regressions)}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
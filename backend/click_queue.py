@@ -0,0 +1,70 @@
+import threading
+from collections import deque
+
+class ClickQueue:
+    """Bounded queue of pending clicks for a lobby's current round.
+
+    Socket handlers push clicks and return immediately; a single consumer on
+    the scheduler drains them in batches. When the queue is full new clicks
+    are rejected so a burst can't grow memory without limit.
+    """
+
+    def __init__(self, capacity=10000, batch_size=500):
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self._items = deque()
+        self._lock = threading.Lock()
+        # Backpressure counters (cumulative)
+        self.enqueued = 0
+        self.dropped = 0
+        self.batches = 0
+        self.drained = 0
+        self.high_watermark = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def push(self, item):
+        """Queue an item. Returns the queue depth after the push, or 0 if the
+        queue was full and the item was dropped."""
+        with self._lock:
+            depth = len(self._items)
+            if depth >= self.capacity:
+                self.dropped += 1
+                return 0
+            self._items.append(item)
+            self.enqueued += 1
+            depth += 1
+            if depth > self.high_watermark:
+                self.high_watermark = depth
+            return depth
+
+    def drain(self):
+        """Remove and return up to batch_size items in arrival order"""
+        with self._lock:
+            count = min(len(self._items), self.batch_size)
+            batch = [self._items.popleft() for _ in range(count)]
+            if batch:
+                self.batches += 1
+                self.drained += count
+            return batch
+
+    def clear(self):
+        """Remove everything still queued (e.g. when a new round starts) and
+        return it, so the senders can still be answered"""
+        with self._lock:
+            items = list(self._items)
+            self._items.clear()
+            return items
+
+    def get_stats(self):
+        """Queue depth and backpressure counters"""
+        return {
+            'depth': len(self._items),
+            'capacity': self.capacity,
+            'enqueued': self.enqueued,
+            'dropped': self.dropped,
+            'batches': self.batches,
+            'drained': self.drained,
+            'high_watermark': self.high_watermark
+        }
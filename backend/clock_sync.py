@@ -0,0 +1,111 @@
+import threading
+import time
+from array import array
+
+class _ClockSamples:
+    """Ring buffer of the latest (rtt, offset) samples for one connection"""
+    __slots__ = ('rtts', 'offsets', 'next', 'count', 'rtt', 'offset')
+
+    def __init__(self, window):
+        self.rtts = array('d', [0.0] * window)
+        self.offsets = array('d', [0.0] * window)
+        self.next = 0     # slot the next sample is written to
+        self.count = 0    # samples received so far (not capped)
+        # Current estimate: the sample with the lowest RTT in the window
+        self.rtt = None
+        self.offset = None
+
+
+class ClockSync:
+    """Per-connection client clock offsets estimated from clock_ping/clock_pong.
+
+    The server sends its time t0 in a ping; the client answers with t0 and
+    its own clock reading. With the pong received at t3, the round trip is
+    t3 - t0 and the client clock is assumed to have been read halfway
+    through it. Like NTP, only the lowest-RTT sample of the recent window is
+    trusted, since it has the least queueing asymmetry. Clicks can then be
+    mapped onto the server clock without any extra round trip.
+    """
+
+    WINDOW = 8             # Samples kept per connection
+    WARMUP_SAMPLES = 4     # Pings sent back to back after a connection registers
+    PING_INTERVAL = 5.0    # Seconds between background pings
+    MAX_RTT = 5.0          # Older pongs (or forged ping times) are ignored
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self._samples = {}  # player_id -> _ClockSamples
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._samples)
+
+    def make_ping(self):
+        """Payload for a clock_ping event"""
+        return {'t': time.time()}
+
+    def record(self, player_id, sent, client_time, received=None):
+        """Add a pong sample. Returns False if the sample was rejected."""
+        if received is None:
+            received = time.time()
+        try:
+            rtt = received - float(sent)
+            offset = float(client_time) - (float(sent) + rtt / 2)
+        except (TypeError, ValueError):
+            return False
+        if not 0 <= rtt <= self.MAX_RTT:
+            return False
+
+        with self._lock:
+            samples = self._samples.get(player_id)
+            if samples is None:
+                samples = self._samples[player_id] = _ClockSamples(self.window)
+            slot = samples.next
+            samples.rtts[slot] = rtt
+            samples.offsets[slot] = offset
+            samples.next = (slot + 1) % self.window
+            samples.count += 1
+
+            # Min-RTT filter over the samples currently in the window
+            filled = min(samples.count, self.window)
+            best = min(range(filled), key=samples.rtts.__getitem__)
+            samples.rtt = samples.rtts[best]
+            samples.offset = samples.offsets[best]
+        return True
+
+    def remove(self, player_id):
+        """Forget a connection's samples"""
+        with self._lock:
+            self._samples.pop(player_id, None)
+
+    def sample_count(self, player_id):
+        """Number of pongs received from a connection"""
+        samples = self._samples.get(player_id)
+        return 0 if samples is None else samples.count
+
+    def get_offset(self, player_id):
+        """Estimated client clock minus server clock in seconds, or None"""
+        samples = self._samples.get(player_id)
+        return None if samples is None else samples.offset
+
+    def get_rtt(self, player_id):
+        """Round trip of the sample the offset is based on, or None"""
+        samples = self._samples.get(player_id)
+        return None if samples is None else samples.rtt
+
+    def to_server_time(self, player_id, client_time):
+        """Map a client timestamp onto the server clock, or None without an estimate"""
+        offset = self.get_offset(player_id)
+        if offset is None:
+            return None
+        return client_time - offset
+
+    def get_stats(self):
+        """Summary of the current estimates"""
+        with self._lock:
+            rtts = [samples.rtt for samples in self._samples.values()]
+        return {
+            'connections': len(rtts),
+            'avg_rtt_ms': round(sum(rtts) / len(rtts) * 1000, 1) if rtts else None,
+            'max_rtt_ms': round(max(rtts) * 1000, 1) if rtts else None
+        }
@@ -0,0 +1,52 @@
+import bisect
+import hashlib
+
+class HashRing:
+    """Consistent hash ring mapping lobby ids to worker processes.
+
+    Each worker is placed on the ring many times (virtual nodes) so keys spread
+    evenly, and adding or removing a worker only moves the keys next to it.
+    """
+
+    def __init__(self, nodes=(), replicas=100):
+        self.replicas = replicas
+        self._keys = []   # sorted hashes of virtual nodes
+        self._nodes = {}  # virtual node hash -> node id
+        for node in nodes:
+            self.add_node(node)
+
+    @staticmethod
+    def _hash(key):
+        return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+    def add_node(self, node):
+        """Place a worker on the ring"""
+        for i in range(self.replicas):
+            point = self._hash(f'{node}#{i}')
+            if point not in self._nodes:
+                bisect.insort(self._keys, point)
+            self._nodes[point] = node
+
+    def remove_node(self, node):
+        """Take a worker off the ring"""
+        for i in range(self.replicas):
+            point = self._hash(f'{node}#{i}')
+            if self._nodes.get(point) == node:
+                del self._nodes[point]
+                self._keys.pop(bisect.bisect_left(self._keys, point))
+
+    def get_node(self, key):
+        """Get the worker that owns key, or None if the ring is empty"""
+        if not self._keys:
+            return None
+        index = bisect.bisect(self._keys, self._hash(key)) % len(self._keys)
+        return self._nodes[self._keys[index]]
+
+
+def parse_workers(spec):
+    """Parse a "id=url,id=url" worker list into a dict"""
+    workers = {}
+    for item in filter(None, (part.strip() for part in (spec or '').split(','))):
+        worker_id, _, url = item.partition('=')
+        workers[worker_id] = url
+    return workers
@@ -1,60 +1,280 @@
-import time
 import random
 import threading
+import time
+import metrics
+import native
+import protocol
+from click_queue import ClickQueue
+from clock_sync import ClockSync
+from leaderboard import LeaderboardIndex
+from player_registry import PlayerRegistry
+from profiler import profiled
+from round_history import RoundHistory
+from round_pool import RoundPool
+from snapshot import Snapshot, write_snapshot
+from socket_json import FrameCache, PreEncoded, pre_encode
+from scheduler import RoundScheduler
 from round_types.color_change import ColorChangeRound
 from round_types.brightness import BrightnessRound
 from round_types.click_box import ClickBoxRound
 from round_types.double_trouble import DoubleTroubleRound
 from round_types.tic_tac_toe import TicTacToeRound
+from round_types.result_codes import ResultCode
+
+# Result codes that count as a successful click in the round type stats
+SUCCESS_CODES = (ResultCode.SUCCESS, ResultCode.PERFECT, ResultCode.GOOD)
+
+class RoundState:
+    """Lifecycle of the rounds in one lobby"""
+    WAITING = 'waiting'      # No round has been played yet
+    COUNTDOWN = 'countdown'  # Round announced, waiting for its activation deadline
+    ACTIVE = 'active'        # Players can interact
+    SCORING = 'scoring'      # Round over; results are being scored and broadcast
+    FINISHED = 'finished'    # Results published; the next round may start
+
+    IN_PROGRESS = (COUNTDOWN, ACTIVE)
+    IDLE = (WAITING, FINISHED)
 
 class GameManager:
-    def __init__(self):
-         # Add a mapping of username to player_id
-        self.username_to_id = {}  # username -> player_id
-        # Player tracking
-        self.players = {}  # player_id -> {'username': str, 'score': float, 'ready': bool}
+    LEADERBOARD_SIZE = 20
+    CLICK_QUEUE_SIZE = 10000   # Pending clicks per round before new ones are rejected
+    CLICK_BATCH_SIZE = 500     # Clicks processed per drain of the queue
+
+    def __init__(self, lobby_id='main', scheduler=None, clock=None, history_dir=None, snapshot_path=None,
+                 stats_store=None):
+        # Lobby this game belongs to and the socket room its players share
+        self.lobby_id = lobby_id
+        self.room = f'lobby:{lobby_id}'
+        # Players that negotiated the compact wire encoding share a second room
+        self.compact_room = f'{self.room}:compact'
+        self.player_encodings = {}  # player_id -> encoding, only for non-JSON players
+        # Player tracking: player_id -> PlayerRecord, stored in per-field arrays
+        self.players = PlayerRegistry()
+        self.username_to_id = self.players.username_to_id  # username -> player_id
+        # Players with at least one round played, ordered by (avg_time, player_id)
+        self.leaderboard_index = LeaderboardIndex()
+        # Last published top entries; clients hold a copy and apply versioned deltas
+        self.leaderboard_version = 0
+        self._leaderboard_snapshot = []
         self.current_round = None
-        self.round_in_progress = False
+        # Round state machine; every transition happens under the lock
+        self.state = RoundState.WAITING
+        self._lock = threading.RLock()
+        self._end_requested = False  # Whether an end has already been queued for the current round
         # self.round_types = [ColorChangeRound, BrightnessRound, ClickBoxRound, DoubleTroubleRound, TicTacToeRound]
         self.round_types = [TicTacToeRound]
-        self.round_history = []
+        # Recent rounds in memory, older ones spilled to an on-disk log
+        self.round_history = RoundHistory(history_dir)
         self.socketio = None  # Will be set by the Flask-SocketIO instance
-        self.current_round_id = 0 
+        # Continue numbering after rounds already on disk so ids stay unique
+        self.current_round_id = self.round_history.last_round_id
+        # Called after player joins/leaves and round transitions (e.g. to refresh /api/status)
+        self.on_change = None
+        # Per round type totals: name -> {'rounds', 'players', 'results', 'successes'}
+        self.round_type_stats = {}
+        # Durable per-username stats (optional), written once per scored round
+        self.stats_store = stats_store
+        # Periodic snapshots let a restarted server pick up where it left off
+        self.snapshot_path = snapshot_path
+        self._snapshot_writer = None  # Background thread writing the latest snapshot
+        self._restored = Snapshot.load(snapshot_path)  # Saved stats of players not back yet
+        if self._restored is not None:
+            header = self._restored.header
+            self.round_history.restore(header['recent_history'])
+            self.current_round_id = max(self.current_round_id, header['current_round_id'])
+            self.leaderboard_version = header['leaderboard_version']
+        # Deadline scheduler that drives round phases instead of per-round threads
+        self.scheduler = scheduler or RoundScheduler()
+        self._round_timers = []  # Pending phase callbacks for the current round
+        # Clicks are queued by socket handlers and drained in batches on the scheduler
+        self.click_queue = ClickQueue(self.CLICK_QUEUE_SIZE, self.CLICK_BATCH_SIZE)
+        self._click_latency = None  # Click latency histogram of the current round type
+        # Client clock offsets used to map click timestamps onto the server clock
+        self.clock = clock or ClockSync()
+        # Rounds are built and encoded ahead of time; warm the pool up in the background
+        self.round_pool = RoundPool(self.players)
+        # Encoded round_start, game state and leaderboard frames of the current
+        # state; cleared on every state transition
+        self.frames = FrameCache()
+        self.scheduler.call_soon(self._refill_round_pool)
+        
+    @property
+    def round_in_progress(self):
+        """Whether a round has started and not yet been scored"""
+        return self.state in RoundState.IN_PROGRESS
+    
+    def _transition(self, round_id, from_states, to_state):
+        """Atomically move the current round from one of from_states to to_state.
+        Returns False (and changes nothing) if the round or state doesn't match."""
+        with self._lock:
+            if round_id != self.current_round_id or self.state not in from_states:
+                return False
+            self.state = to_state
+            self.frames.clear()
+            self._changed()
+            return True
+    
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change()
         
     def set_socketio(self, socketio_instance):
         """Set the Flask-SocketIO instance for broadcasts"""
         self.socketio = socketio_instance
         
-    def add_player(self, player_id, username):
+    def add_player(self, player_id, username, encoding=protocol.JSON):
         """Add a new player to the game"""
-         # If username already exists, remove the old connection
-        if username in self.username_to_id:
-            old_player_id = self.username_to_id[username]
-            if old_player_id in self.players:
-                del self.players[old_player_id]
+        # Look up saved stats before taking the lock; usually an LRU cache hit
+        saved_stats = self.stats_store.get(self.lobby_id, username) if self.stats_store else None
+        with self._lock:
+             # If username already exists, the registry drops the old connection
+            old_player_id = self.username_to_id.get(username)
+            if old_player_id is not None and old_player_id != player_id:
+                self.leaderboard_index.remove(old_player_id)
+                self.player_encodings.pop(old_player_id, None)
+                if self.round_in_progress:
+                    self.current_round.discard_player(old_player_id)
             
-        # Update username to player_id mapping
-        self.username_to_id[username] = player_id
-            
-        self.players[player_id] = {
-            'username': username,
-            'score': 0,
-            'rounds_played': 0,
-            'ready': True,
-            'avg_time': 0
-        }
-        return True
+            # A re-registering connection starts from its saved stats, if any
+            self.leaderboard_index.remove(player_id)
+            self.players.add(player_id, username)
+            # Players back after a restart may also have stats in the snapshot
+            snapshot_stats = self._restored.take(username) if self._restored is not None else None
+            stats = saved_stats or snapshot_stats
+            if stats is not None:
+                avg_time, rounds_played = stats
+                self.players.restore_stats(player_id, avg_time, rounds_played)
+                self.leaderboard_index.update(player_id, avg_time)
+                # After a restart the restored leaderboard version has no entries
+                # until the returning players are published into it
+                rank = self.leaderboard_index.rank(player_id)
+                if snapshot_stats is not None and rank is not None and rank < self.LEADERBOARD_SIZE:
+                    self._publish_leaderboard()
+            if encoding == protocol.JSON:
+                self.player_encodings.pop(player_id, None)
+            else:
+                self.player_encodings[player_id] = encoding
+            self._changed()
+            return True
         
     def remove_player(self, player_id):
         """Remove a player from the game"""
-        if player_id in self.players:
-            username = self.players[player_id]['username']
-            # Clean up username mapping
-            if username in self.username_to_id:
-                del self.username_to_id[username]
-            del self.players[player_id]
+        with self._lock:
+            # Frees the player's slot and username mapping
+            if self.players.remove(player_id):
+                self.leaderboard_index.remove(player_id)
+                self.player_encodings.pop(player_id, None)
+                # Stop waiting on the player; they may have been the last one
+                if self.round_in_progress:
+                    self.current_round.discard_player(player_id)
+                    self._request_end_if_done()
+                self._changed()
+                return True
+            return False
+    
+    def get_player_room(self, player_id):
+        """Get the socket room a player should join for broadcasts in their encoding"""
+        if player_id in self.player_encodings:
+            return self.compact_room
+        return self.room
+    
+    def get_player_encoding(self, player_id):
+        return self.player_encodings.get(player_id, protocol.JSON)
+    
+    def encode_for(self, player_id, event, payload):
+        """Encode an event payload in the wire encoding the player negotiated"""
+        return protocol.encode(event, payload, self.get_player_encoding(player_id))
+    
+    def _broadcast(self, event, payload, compact_payload=None):
+        """Emit an event to every player in the lobby, once per wire encoding.
+        compact_payload, if given, is sent to compact players as is. Each
+        payload is encoded once and spliced into every recipient's packet."""
+        if not self.socketio:
+            return
+        started = time.perf_counter()
+        self.socketio.emit(event, pre_encode(payload), room=self.room)
+        if self.player_encodings:
+            if compact_payload is None:
+                compact_payload = protocol.encode(event, payload.value if isinstance(payload, PreEncoded) else payload,
+                                                  protocol.COMPACT)
+            self.socketio.emit(event, pre_encode(compact_payload), room=self.compact_room)
+        metrics.BROADCAST_TIME.labels(event).observe(time.perf_counter() - started)
+        metrics.BROADCAST_FANOUT.labels(event).observe(len(self.players))
+    
+    @profiled('clock_sync')
+    def ping_clocks(self):
+        """Send a clock_ping to every player so their clock offsets stay fresh"""
+        if self.players:
+            self._broadcast('clock_ping', self.clock.make_ping())
+    
+    def _send_to_player(self, event, payload, player_id):
+        """Emit an event to one player in their wire encoding"""
+        if self.socketio:
+            self.socketio.emit(event, self.encode_for(player_id, event, payload), room=player_id)
+    
+    def shutdown(self):
+        """Stop the current round and drop any pending phases (used on lobby teardown)"""
+        with self._lock:
+            self.state = RoundState.FINISHED
+            self.frames.clear()
+            self._cancel_round_timers()
+            self.round_history.close()
+        self.save_snapshot(wait=True)
+    
+    @profiled('snapshot')
+    def save_snapshot(self, wait=False):
+        """Save player stats, round counters and in-memory history to the
+        snapshot file. The state is copied under the lock and written on a
+        background OS thread, so rounds keep running while it is saved.
+        Returns False if a previous snapshot is still being written."""
+        if self.snapshot_path is None:
+            return False
+        writer = self._snapshot_writer
+        if writer is not None and writer.is_alive():
+            if not wait:
+                return False
+            writer.join()
+
+        with self._lock:
+            # Flat copies of the columns (the arrays are plain memcpys)
+            players = self.players
+            usernames = players.usernames[:]
+            avg_times = players.avg_times[:]
+            rounds_played = players.rounds_played[:]
+            header = {
+                'lobby_id': self.lobby_id,
+                'saved_at': time.time(),
+                'current_round_id': self.current_round_id,
+                'leaderboard_version': self.leaderboard_version,
+                'recent_history': self.round_history.recent_records()
+            }
+
+        args = (header, usernames, avg_times, rounds_played)
+        if wait:
+            self._write_snapshot(*args)
             return True
-        return False
+        self._snapshot_writer = native.Thread(target=self._write_snapshot, args=args)
+        self._snapshot_writer.start()
+        return True
+    
+    def _write_snapshot(self, header, usernames, avg_times, rounds_played):
+        try:
+            rows = [(username.encode('utf-8'), avg_time, rounds)
+                    for username, avg_time, rounds in zip(usernames, avg_times, rounds_played)
+                    if username is not None and rounds]
+            # Keep the saved stats of players who haven't come back since the restart
+            if self._restored is not None:
+                connected = {row[0] for row in rows}
+                rows.extend(row for row in self._restored.untaken_rows() if row[0] not in connected)
+            rows.sort()
+            write_snapshot(self.snapshot_path, header, rows)
+        except Exception as e:
+            print(f"Error saving snapshot of lobby {self.lobby_id}: {e}")
+    
+    def _cancel_round_timers(self):
+        for timer in self._round_timers:
+            timer.cancel()
+        self._round_timers = []
     
     def get_player_count(self):
         """Get the current number of active players"""
@@ -68,23 +288,33 @@ class GameManager:
         return {
             "type": self.current_round.__class__.__name__,
             "in_progress": self.round_in_progress,
+            "state": self.state,
             "round_id": self.current_round_id
         }
     
+    def get_game_state_frame(self, encoding=protocol.JSON):
+        """get_game_state() in a wire encoding, encoded once per state transition
+        and shared by every player who joins in between"""
+        with self._lock:
+            return self.frames.get(('game_state', encoding),
+                                   lambda: protocol.encode_game_state(self.get_game_state(), encoding))
+    
     def get_game_state(self):
         """Get the current game state for a newly connected player"""
-        state = {
-            "status": "waiting" if not self.round_in_progress else "in_progress",
-            "leaderboard": self._get_leaderboard()  # Add this line
-        }
-        if self.current_round is not None and self.round_in_progress:
-            state.update({
-                "round_type": self.current_round.__class__.__name__,
-                "round_data": self.current_round.get_client_data(),
-                "round_id": self.current_round_id
-            })
+        with self._lock:
+            state = {
+                "status": "waiting" if not self.round_in_progress else "in_progress",
+                "leaderboard": self._leaderboard_snapshot,
+                "leaderboard_version": self.leaderboard_version
+            }
+            if self.current_round is not None and self.round_in_progress:
+                state.update({
+                    "round_type": self.current_round.__class__.__name__,
+                    "round_data": self.current_round.get_client_data(),
+                    "round_id": self.current_round_id
+                })
 
-        return state
+            return state
 
     def is_round_in_progress(self):
         """Check if a round is currently in progress"""
@@ -92,170 +322,355 @@ class GameManager:
     
     def set_player_ready(self, player_id):
         """Mark a player as ready for the next round"""
-        if player_id in self.players:
-            self.players[player_id]['ready'] = True
-            return True
-        return False
+        with self._lock:
+            return self.players.set_ready(player_id)
     
     def should_start_next_round(self):
         """Check if all conditions are met to start the next round"""
-        # Don't start if a round is already in progress
-        if self.round_in_progress:
-            return False
+        with self._lock:
+            # Don't start if a round is already in progress
+            if self.round_in_progress:
+                return False
             
-        # Only start if we have at least one player
-        if not self.players:
-            return False
+            # Only start if we have at least one player
+            if not self.players:
+                return False
             
-        # Check if all players are ready
-        return all(player['ready'] for player in self.players.values())
+            # Check if all players are ready
+            return self.players.all_ready()
     
+    @profiled('start')
     def start_next_round(self):
         """Start the next round"""
-        if self.round_in_progress:
-            return False
-            
-        # Reset player ready status
-        for player_id in self.players:
-            self.players[player_id]['ready'] = False
-            
-        # Select a random round type
-        RoundClass = random.choice(self.round_types)
-        self.current_round = RoundClass(players=self.players)
-        self.round_in_progress = True
+        with self._lock:
+            # Only one caller can move the lobby out of an idle state
+            if self.state not in RoundState.IDLE:
+                return False
+                
+            # Reset player ready status
+            self.players.set_all_ready(False)
+                
+            # Select a random round type
+            RoundClass = random.choice(self.round_types)
+            self.current_round = self.round_pool.take(RoundClass)
+            self.current_round.clock = self.clock
+            # Histogram this round's clicks are recorded in, looked up once per round
+            self._click_latency = metrics.CLICK_LATENCY.labels(RoundClass.__name__)
+            self.state = RoundState.COUNTDOWN
+            self._end_requested = False
+            # Clicks still queued for the previous round get an answer instead
+            # of being dropped silently
+            for _, player_id, _ in self.click_queue.clear():
+                self._send_to_player('click_result', {"success": False, "code": ResultCode.OUTDATED_ROUND},
+                                     player_id)
 
-        # Increment round ID for the new round
-        self.current_round_id += 1
-        round_id = self.current_round_id
-        
-        # Get round initialization data
-        round_data = self.current_round.get_client_data()
-        
-        # Broadcast round start to all clients
-        if self.socketio:
-            self.socketio.emit('round_start', {
-                'round_type': self.current_round.__class__.__name__,
-                'round_data': round_data,
+            # Increment round ID for the new round
+            self.current_round_id += 1
+            self.frames.clear()
+            self._changed()
+            round_id = self.current_round_id
+            
+            # Broadcast round start to all clients; the round data was encoded
+            # when the round was built
+            round_type = RoundClass.__name__
+            round_data = self.current_round.encoded_client_data
+            self._broadcast('round_start', self.frames.get(('round_start', protocol.JSON), lambda: {
+                'round_type': round_type,
+                'round_data': round_data[protocol.JSON],
                 'round_id': round_id
-            }, room='waiting_room')
+            }), self.frames.get(('round_start', protocol.COMPACT), lambda: [
+                round_id, protocol.round_type_index(round_type), round_data[protocol.COMPACT]
+            ]))
+                
+            # Queue the round's phases on the scheduler
+            self.current_round.start()
+            self._round_timers = [
+                self.scheduler.call_later(offset, self._advance_round, round_id, phase)
+                for offset, phase in self.current_round.get_timeline()
+            ]
+            # Replace the pooled round once this one is under way
+            self.scheduler.call_soon(self._refill_round_pool)
             
-        # Start round execution thread
-        thread = threading.Thread(target=self._execute_round, args=(round_id,))
-        thread.daemon = True
-        thread.start()
-        
-        return True
+            return True
+
+    def _refill_round_pool(self):
+        """Build rounds for the pool on the scheduler, off the round start path"""
+        self.round_pool.fill(self.round_types)
     
-    def _execute_round(self, round_id):
-        """Execute the current round logic in a separate thread"""
-        # Check if this execution is for the current round
-        if round_id != self.current_round_id:
-            return  # Ignore outdated round execution
-        
-        # Let the round run its course
-        self.current_round.execute()
-        
-        # When round is complete, calculate and update scores, using the round_id to prevent race conditions
-        if self.round_in_progress and round_id == self.current_round_id:
+    @profiled('activate')
+    def _advance_round(self, round_id, phase):
+        """Fire a scheduled round phase on the scheduler thread"""
+        if phase == 'active':
+            with self._lock:
+                # Ignore outdated round phases
+                if self._transition(round_id, (RoundState.COUNTDOWN,), RoundState.ACTIVE):
+                    current_round = self.current_round
+                    current_round.activate()
+                    # How far the scheduler fired past the planned activation
+                    metrics.PHASE_DRIFT.labels(current_round.__class__.__name__).observe(
+                        current_round.active_time - current_round.start_time - current_round.get_activation_delay())
+        elif phase == 'end':
             self._end_round(round_id)
     
+    @profiled('score')
     def _end_round(self, round_id):
-        """End the current round and update scores"""
-
-        # Check if this is still the active round
-        if round_id != self.current_round_id:
-            return  # Ignore outdated round end request
-        
-        self.round_in_progress = False        
+        """End the current round and update scores. Safe to call more than once:
+        only the first call for a round gets past the SCORING transition."""
+        with self._lock:
+            if not self._transition(round_id, RoundState.IN_PROGRESS, RoundState.SCORING):
+                return  # Ignore outdated or duplicate round end request
+            started = time.perf_counter()
+            try:
+                self._score_round(round_id)
+            finally:
+                # Never leave the lobby stuck in SCORING if scoring fails
+                self.state = RoundState.FINISHED
+                self.frames.clear()
+                self._changed()
+                metrics.END_ROUND.labels(self.current_round.__class__.__name__).observe(
+                    time.perf_counter() - started)
+            
+            # Check if we should auto-start the next round
+            if self.should_start_next_round():
+                self.start_next_round()
+    
+    def _score_round(self, round_id):
+        """Score, record and broadcast the round that just ended (lock held)"""
+        # Drop any phases that haven't fired yet
+        self._cancel_round_timers()
         
-        # Get round results
-        results = self.current_round.get_results()
+        current_round = self.current_round
         
-        # Update player scores
-        self._update_player_scores(results)
+        # Update player scores in one batch pass over the result columns
+        self._update_player_scores(current_round)
 
-        # Save round in history
-        self.round_history.append({
-            'round_id': round_id,
-            'round_type': self.current_round.__class__.__name__,
-            'results': results
-        })
+        self._record_round_type_stats(current_round)
+
+        # Persist the new stats in one write-behind batch
+        if self.stats_store is not None:
+            self.stats_store.save_round(self.lobby_id, self.players.stats_rows())
+
+        # Save round in history; players without a recorded result scored NO_CLICK
+        self.round_history.append(round_id, current_round.__class__.__name__,
+                                  len(self.players), current_round.player_results)
         
-        # Get leaderboard
-        leaderboard = self._get_leaderboard()
+        # Publish a new leaderboard version
+        leaderboard_delta = self._publish_leaderboard()
         
-        # Broadcast round end and results
+        # Broadcast round end with only the leaderboard changes, then send
+        # each player just their own result
+        self._broadcast('round_end', {
+            'leaderboard_delta': leaderboard_delta,
+            'round_id': round_id
+        })
+        # Everyone who didn't click shares one pre-encoded no-click result
+        no_click = {'result': current_round.get_no_click_result(), 'round_id': round_id}
+        no_click_frames = {encoding: PreEncoded(protocol.encode('round_result', no_click, encoding))
+                           for encoding in protocol.ENCODINGS}
+        started = time.perf_counter()
+        for player_id in self.players:
+            if player_id in current_round.player_results:
+                self._send_to_player('round_result', {
+                    'result': current_round.get_player_result(player_id),
+                    'round_id': round_id
+                }, player_id)
+            elif self.socketio:
+                encoding = self.player_encodings.get(player_id, protocol.JSON)
+                self.socketio.emit('round_result', no_click_frames[encoding], room=player_id)
         if self.socketio:
-            self.socketio.emit('round_end', {
-                'results': results,
-                'leaderboard': leaderboard,
-                'round_id': round_id
-            }, room='waiting_room')
-            
-        # Add a delay before allowing the next round to start
-        # time.sleep(5)  # 5 second delay between rounds
-        
-        # Mark all connected players as ready for the next round
-        # for player_id in self.players:
-        #     self.players[player_id]['ready'] = True
-            
-        # Check if we should auto-start the next round
-        if self.should_start_next_round():
-            self.start_next_round()
+            metrics.BROADCAST_TIME.labels('round_result').observe(time.perf_counter() - started)
+            metrics.BROADCAST_FANOUT.labels('round_result').observe(len(self.players))
+    
+    def enqueue_player_click(self, player_id, data):
+        """Queue a click for batch processing. Returns an immediate result if
+        the click is rejected, or None when the result will be sent once the
+        click is processed."""
+        if not self.round_in_progress:
+            return {"success": False, "code": ResultCode.NO_ROUND}
+        if player_id not in self.players:
+            return {"success": False, "code": ResultCode.NOT_REGISTERED}
+        if not isinstance(data, dict):
+            return {"success": False, "code": ResultCode.INVALID_CLICK}
+
+        # Stamp the arrival time so queueing delay doesn't count as reaction time
+        data = dict(data, server_received=time.time())
+        depth = self.click_queue.push((self.current_round_id, player_id, data))
+        if not depth:
+            return {"success": False, "code": ResultCode.BUSY}
+
+        # The first click into an empty queue wakes the consumer; it keeps
+        # rescheduling itself while clicks remain
+        if depth == 1:
+            self.scheduler.call_soon(self._drain_clicks)
+        return None
+    
+    @profiled('clicks')
+    def _drain_clicks(self):
+        """Process one batch of queued clicks on the scheduler thread"""
+        with self._lock:
+            batch = self.click_queue.drain()
+            results = self._process_clicks(batch)
+            # Yield to other scheduled work between batches
+            if len(self.click_queue):
+                self.scheduler.call_soon(self._drain_clicks)
+
+        for (_, player_id, _), result in zip(batch, results):
+            self._send_to_player('click_result', result, player_id)
     
-    def process_player_click(self, player_id, data, round_id=None):
-        """Process a player's click during a round"""
+    def _reject_click(self, player_id, round_id):
+        """Result for a click the current round can't take, or None (lock held)"""
         if not self.round_in_progress or self.current_round is None:
-            return {"success": False, "message": "No round in progress"}
+            return {"success": False, "code": ResultCode.NO_ROUND}
             
         if player_id not in self.players:
-            return {"success": False, "message": "Player not registered"}
+            return {"success": False, "code": ResultCode.NOT_REGISTERED}
         
         # If round_id is provided, verify it matches the current round
         if round_id is not None and round_id != self.current_round_id:
-            return {"success": False, "message": "Click for outdated round"}
+            return {"success": False, "code": ResultCode.OUTDATED_ROUND}
+        return None
+    
+    def _process_clicks(self, batch):
+        """Results of a drained batch of (round_id, player_id, data) clicks, in
+        order. The clicks the current round accepts are handed to it together,
+        so rounds like tic-tac-toe check all their moves in one pass (lock held)."""
+        results = []
+        accepted = []
+        for round_id, player_id, data in batch:
+            result = self._reject_click(player_id, round_id)
+            if result is None:
+                accepted.append((player_id, data))
+            results.append(result)
+        if not accepted:
+            return results
             
-        # Let the current round handle the click logic
-        result = self.current_round.process_click(player_id, data)
+        try:
+            round_results = self.current_round.process_clicks(accepted)
+        except Exception as e:
+            # One malformed click must not cost the rest of the batch their results
+            print(f"Error processing a batch of clicks in lobby {self.lobby_id}, retrying one by one: {e}")
+            round_results = [self._process_click_safely(player_id, data) for player_id, data in accepted]
+        round_results = iter(round_results)
+        for index, result in enumerate(results):
+            if result is None:
+                results[index] = next(round_results)
+        # Includes the time the clicks waited in the queue
+        now = time.time()
+        observe = self._click_latency.observe
+        for _, data in accepted:
+            observe(now - data['server_received'])
         
         # Check if the round should end (all players clicked or timeout)
-        if self.current_round.should_end():
-            # Signal round end in a non-blocking way
-            thread = threading.Thread(target=self._end_round, args=(self.current_round_id,))
-            thread.daemon = True
-            thread.start()
-            
-        return result
+        self._request_end_if_done()
+        return results
+    
+    def _process_click_safely(self, player_id, data):
+        """Process one click, answering INVALID_CLICK if the round fails on it (lock held)"""
+        try:
+            return self.current_round.process_click(player_id, data)
+        except Exception as e:
+            print(f"Error processing click from {player_id} in lobby {self.lobby_id}: {e}")
+            return {"success": False, "code": ResultCode.INVALID_CLICK}
+
+    def _request_end_if_done(self):
+        """Queue the round end once the round says it's over; only once per
+        round however many clicks arrive (lock held)"""
+        if not self._end_requested and self.current_round.should_end():
+            self._end_requested = True
+            self.scheduler.call_soon(self._end_round, self.current_round_id)
     
-    def _update_player_scores(self, results):
+    def get_click_queue_stats(self):
+        """Click ingestion backpressure metrics for this lobby"""
+        stats = self.click_queue.get_stats()
+        stats['outstanding_players'] = len(self.current_round.awaiting) if self.round_in_progress else 0
+        return stats
+
+    def _update_player_scores(self, current_round):
         """Update player scores based on round results"""
-        for player_id, result in results.items():
-            if player_id in self.players:
-                player = self.players[player_id]
-                
-                # Get the reaction time or use a penalty value if invalid click
-                reaction_time = result.get('reaction_time', 10.0)  # 10 seconds is penalty
-                
-                # Update player's total score and rounds played
-                current_total = player['avg_time'] * player['rounds_played']
-                player['rounds_played'] += 1
-                player['avg_time'] = (current_total + reaction_time) / player['rounds_played']
+        # Every registered player gets a result each round: the recorded reaction
+        # time (penalty if invalid) or the no-click penalty
+        slots, reaction_times, _ = current_round.get_result_columns()
+        self.players.record_round_batch(slots, reaction_times, current_round.NO_CLICK_PENALTY)
+        
+        # Everyone moved, so rebuilding the index in rank order beats n updates
+        self.leaderboard_index.rebuild(self.players.ranked_keys())
     
-    def _get_leaderboard(self):
+    def _get_leaderboard(self, limit=LEADERBOARD_SIZE):
         """Generate a leaderboard sorted by average reaction time (lower is better)"""
+        players = self.players
         leaderboard = []
         
-        for player_id, player_data in self.players.items():
-            if player_data['rounds_played'] > 0:
-                leaderboard.append({
-                    'username': player_data['username'],
-                    'avg_time': player_data['avg_time'],
-                    'rounds_played': player_data['rounds_played'],
-                    'player_id': player_id
-                })
+        # The index is already sorted, so only the top entries are touched
+        for player_id in self.leaderboard_index.top(limit):
+            slot = players.slot(player_id)
+            leaderboard.append({
+                'username': players.usernames[slot],
+                'avg_time': players.avg_times[slot],
+                'rounds_played': players.rounds_played[slot],
+                'player_id': player_id
+            })
+        
+        return leaderboard
+    
+    def get_leaderboard_snapshot(self):
+        """Get the current leaderboard version for a client that needs to resync"""
+        return {
+            'leaderboard': self._leaderboard_snapshot,
+            'version': self.leaderboard_version
+        }
+    
+    def get_leaderboard_snapshot_frame(self):
+        """get_leaderboard_snapshot(), encoded once per leaderboard version"""
+        with self._lock:
+            return self.frames.get(('leaderboard_snapshot', protocol.JSON), self.get_leaderboard_snapshot)
+    
+    def _publish_leaderboard(self):
+        """Snapshot the top entries as a new version and return the delta from the previous one"""
+        previous = {entry['player_id']: entry for entry in self._leaderboard_snapshot}
         
-        # Sort by average time (lower is better)
-        leaderboard.sort(key=lambda x: x['avg_time'])
+        snapshot = self._get_leaderboard()
+        changed = []
+        for rank, entry in enumerate(snapshot, start=1):
+            entry['rank'] = rank
+            # Entries that entered the top list, moved, or got new stats
+            if previous.pop(entry['player_id'], None) != entry:
+                changed.append(entry)
         
-        # Return top 20 players
-        return leaderboard[:20]
\ No newline at end of file
+        self.leaderboard_version += 1
+        self._leaderboard_snapshot = snapshot
+        self.frames.clear()
+        return {
+            'base_version': self.leaderboard_version - 1,
+            'version': self.leaderboard_version,
+            'changed': changed,
+            # Whatever is left in previous dropped out of the top list
+            'removed': list(previous)
+        }
+    
+    def _record_round_type_stats(self, current_round):
+        stats = self.round_type_stats.setdefault(current_round.__class__.__name__, {
+            'rounds': 0, 'players': 0, 'results': 0, 'successes': 0
+        })
+        codes = current_round.result_codes
+        stats['rounds'] += 1
+        stats['players'] += len(self.players)
+        stats['results'] += len(codes)
+        stats['successes'] += sum(codes.count(code) for code in SUCCESS_CODES)
+    
+    def get_lobby_stats(self):
+        """Summary of this lobby for the detailed status (no per-player work)"""
+        return {
+            'players': len(self.players),
+            'state': self.state,
+            'round_id': self.current_round_id,
+            'round_type': self.current_round.__class__.__name__ if self.current_round else None,
+            'leaderboard_version': self.leaderboard_version,
+            'history_rounds': len(self.round_history),
+            'round_pool': self.round_pool.get_stats(),
+            'frame_cache': self.frames.get_stats()
+        }
+    
+    def get_player_rank(self, player_id):
+        """Get a player's 1-based leaderboard rank, or None before their first round"""
+        rank = self.leaderboard_index.rank(player_id)
+        return None if rank is None else rank + 1
\ No newline at end of file
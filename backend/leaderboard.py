@@ -0,0 +1,151 @@
+import random
+
+class _Node:
+    __slots__ = ('key', 'next', 'width')
+
+    def __init__(self, key, level):
+        self.key = key
+        self.next = [None] * level   # next node on each level
+        self.width = [1] * level     # base-level steps to that next node
+
+
+class LeaderboardIndex:
+    """Players ordered by (avg_time, player_id), kept in an indexable skip list.
+
+    Updates, removals and rank lookups are O(log n); reading the top K
+    entries is O(K), so the leaderboard never needs a full sort.
+    """
+
+    MAX_LEVEL = 32
+
+    def __init__(self):
+        self._head = _Node(None, self.MAX_LEVEL)
+        self._nodes = {}  # player_id -> the player's node in the skip list
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __contains__(self, player_id):
+        return player_id in self._nodes
+
+    def update(self, player_id, avg_time):
+        """Insert a player or move them to their new average time"""
+        key = (avg_time, player_id)
+        old_node = self._nodes.get(player_id)
+        if old_node is not None:
+            if old_node.key == key:
+                return
+            self._remove_key(old_node.key)
+        self._nodes[player_id] = self._insert_key(key)
+
+    def remove(self, player_id):
+        """Drop a player from the index (no-op if they aren't ranked)"""
+        node = self._nodes.pop(player_id, None)
+        if node is not None:
+            self._remove_key(node.key)
+
+    def rank(self, player_id):
+        """Get a player's 0-based rank, or None if they aren't ranked"""
+        target = self._nodes.get(player_id)
+        if target is None:
+            return None
+        key = target.key
+
+        node = self._head
+        position = 0
+        for level in reversed(range(self.MAX_LEVEL)):
+            while node.next[level] is not None and node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+        return position
+
+    def top(self, k):
+        """Get the player ids of the k best (lowest avg_time) players"""
+        player_ids = []
+        node = self._head.next[0]
+        while node is not None and len(player_ids) < k:
+            player_ids.append(node.key[1])
+            node = node.next[0]
+        return player_ids
+
+    def rebuild(self, keys):
+        """Replace the index with already sorted (avg_time, player_id) keys in
+        O(n), for when most players moved (e.g. after a round is scored).
+        Players already in the index keep their node, so nothing is allocated
+        for them; only the links and widths are rewritten."""
+        head = _Node(None, self.MAX_LEVEL)
+        old_nodes = self._nodes
+        nodes = {}
+        # Last node linked on each level and its 1-based position (head is 0)
+        last = [head] * self.MAX_LEVEL
+        last_position = [0] * self.MAX_LEVEL
+        random_level = self._random_level
+        position = 0
+        for position, key in enumerate(keys, start=1):
+            player_id = key[1]
+            node = old_nodes.get(player_id)
+            if node is None:
+                node = _Node(key, random_level())
+            else:
+                node.key = key
+            nodes[player_id] = node
+            for level in range(len(node.next)):
+                last[level].next[level] = node
+                last[level].width[level] = position - last_position[level]
+                last[level] = node
+                last_position[level] = position
+        # The last node on each level ends it, spanning to one past the end
+        for level in range(self.MAX_LEVEL):
+            last[level].next[level] = None
+            last[level].width[level] = position + 1 - last_position[level]
+        self._head = head
+        self._nodes = nodes
+
+    def _random_level(self):
+        # Geometric with p=1/2: one more level per trailing zero bit
+        bits = random.getrandbits(self.MAX_LEVEL - 1)
+        return (bits & -bits).bit_length() or self.MAX_LEVEL
+
+    def _insert_key(self, key):
+        chain = [None] * self.MAX_LEVEL
+        steps_at_level = [0] * self.MAX_LEVEL
+        node = self._head
+        for level in reversed(range(self.MAX_LEVEL)):
+            while node.next[level] is not None and node.next[level].key < key:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+
+        new_level = self._random_level()
+        new_node = _Node(key, new_level)
+        steps = 0
+        for level in range(new_level):
+            prev = chain[level]
+            new_node.next[level] = prev.next[level]
+            prev.next[level] = new_node
+            new_node.width[level] = prev.width[level] - steps
+            prev.width[level] = steps + 1
+            steps += steps_at_level[level]
+        # Levels above the new node now skip over one more element
+        for level in range(new_level, self.MAX_LEVEL):
+            chain[level].width[level] += 1
+        return new_node
+
+    def _remove_key(self, key):
+        chain = [None] * self.MAX_LEVEL
+        node = self._head
+        for level in reversed(range(self.MAX_LEVEL)):
+            while node.next[level] is not None and node.next[level].key < key:
+                node = node.next[level]
+            chain[level] = node
+
+        target = chain[0].next[0]
+        if target is None or target.key != key:
+            raise KeyError(key)
+
+        for level in range(len(target.next)):
+            prev = chain[level]
+            prev.width[level] += target.width[level] - 1
+            prev.next[level] = target.next[level]
+        for level in range(len(target.next), self.MAX_LEVEL):
+            chain[level].width[level] -= 1
@@ -0,0 +1,257 @@
+"""Load generator: simulated players for a locally running server.
+
+Every simulated player is a python-socketio AsyncClient that registers,
+joins the waiting room and plays each round with a human-like click time for
+its round type. Clients are added in stages; after each stage one line
+reports rounds/sec, click latency percentiles (player_click sent to
+click_result received, i.e. including the server's click queue) and, with
+--server-pid, the server's memory and thread count, so growth can be read
+off as the number of clients increases:
+
+    python loadgen.py --url http://localhost:5000 --clients 100,500,1000,2000 \\
+        --stage-duration 30 --server-pid $(pgrep -f app.py)
+"""
+import argparse
+import asyncio
+import math
+import random
+import time
+from collections import Counter
+
+import socketio
+
+import protocol
+from round_types.result_codes import ResultCode
+
+# Reaction time of a simulated player once the round becomes active, as the
+# (median seconds, sigma) of a log-normal distribution
+REACTION_TIMES = {
+    'click_box': (0.35, 0.3),
+    'color_change': (0.3, 0.3),
+    'double_trouble': (0.45, 0.3),
+    'tic_tac_toe': (1.6, 0.5),  # Reading the board takes a while
+}
+BRIGHTNESS_ERROR = 0.15  # Std deviation (seconds) around the target brightness moment
+WRONG_TARGET_RATE = 0.05 # Chance of clicking the red box / a losing cell
+
+# Rows, columns and diagonals of a tic-tac-toe board
+_LINES = ([[(row, col) for col in range(3)] for row in range(3)] +
+          [[(row, col) for row in range(3)] for col in range(3)] +
+          [[(0, 0), (1, 1), (2, 2)], [(0, 2), (1, 1), (2, 0)]])
+
+
+def winning_move(board):
+    """(row, col) that completes three X's, or None"""
+    for line in _LINES:
+        cells = [board[row][col] for row, col in line]
+        if cells.count('X') == 2 and cells.count(None) == 1:
+            return line[cells.index(None)]
+    return None
+
+
+def plan_click(round_data, miss_rate=0.0):
+    """(seconds after round_start, extra click fields) of a simulated click,
+    or None if the player sits this round out"""
+    kind = round_data.get('type')
+    if random.random() < miss_rate:
+        return None
+    if kind == 'brightness':
+        # Aim for the moment the brightness passes the target
+        target = (round_data['initial_pause'] +
+                  round_data['brightness_duration'] * round_data['target_brightness'] / 100)
+        return max(random.gauss(target, BRIGHTNESS_ERROR), 0.0), {}
+
+    median, sigma = REACTION_TIMES.get(kind, (0.4, 0.3))
+    delay = round_data.get('delay', 0) + random.lognormvariate(math.log(median), sigma)
+    if kind == 'double_trouble':
+        box = round_data['bad_position'] if random.random() < WRONG_TARGET_RATE else round_data['good_position']
+        return delay, {'position': {'x': box['x'] + random.uniform(-0.02, 0.02),
+                                    'y': box['y'] + random.uniform(-0.02, 0.02)}}
+    if kind == 'tic_tac_toe':
+        board = round_data['board']
+        move = winning_move(board) if random.random() >= WRONG_TARGET_RATE else None
+        if move is None:
+            move = random.choice([(row, col) for row in range(3) for col in range(3) if board[row][col] is None])
+        return delay, {'position': {'row': move[0], 'col': move[1]}}
+    return delay, {}
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of a list of samples, or None if empty"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+def process_stats(pid):
+    """(resident MB, threads) of a local process read from /proc, or (None, None)"""
+    if pid is None:
+        return None, None
+    rss = threads = None
+    try:
+        with open(f'/proc/{pid}/status') as status_file:
+            for line in status_file:
+                if line.startswith('VmRSS:'):
+                    rss = int(line.split()[1]) / 1024
+                elif line.startswith('Threads:'):
+                    threads = int(line.split()[1])
+    except OSError:
+        pass
+    return rss, threads
+
+
+class LoadStats:
+    """Counters shared by every simulated player, reset at each stage"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.click_latencies = []  # Seconds from player_click to click_result
+        self.clicks = 0
+        self.codes = Counter()     # click_result codes
+        self.rounds = set()        # (lobby_id, round_id) of rounds that ended
+        self.errors = 0
+
+
+class SimulatedPlayer:
+    """One socket client playing rounds like a person would"""
+
+    def __init__(self, index, args, stats):
+        self.username = f'{args.username_prefix}{index}'
+        self.lobby_id = f'{args.lobby_prefix}{index % args.lobbies}' if args.lobbies > 1 else None
+        self.url = args.url
+        self.encoding = args.protocol
+        self.miss_rate = args.miss_rate
+        self.ready_delay = args.ready_delay
+        self.stats = stats
+        self._click_task = None
+        self._click_sent = None  # perf_counter() of the click awaiting its result
+        self.sio = socketio.AsyncClient(reconnection=False)
+        for event in ('registration_status', 'round_start', 'click_result', 'round_end',
+                      'clock_ping', 'lobby_redirect'):
+            self.sio.on(event, getattr(self, f'on_{event}'))
+
+    async def start(self):
+        await self.sio.connect(self.url, transports=['websocket'], wait_timeout=10)
+        await self.sio.emit('register_player', {
+            'username': self.username, 'lobby_id': self.lobby_id, 'protocol': self.encoding})
+
+    async def stop(self):
+        if self._click_task is not None:
+            self._click_task.cancel()
+        await self.sio.disconnect()
+
+    async def on_registration_status(self, data):
+        success = data[0] if isinstance(data, list) else data['success']
+        if not success:
+            self.stats.errors += 1
+            return
+        await self.sio.emit('join_waiting_room')
+
+    async def on_clock_ping(self, data):
+        await self.sio.emit('clock_pong', {'t': data['t'], 'client': time.time()})
+
+    async def on_round_start(self, data):
+        round_data = data[2] if isinstance(data, list) else data['round_data']
+        if self._click_task is not None:
+            self._click_task.cancel()
+        self._click_sent = None
+        plan = plan_click(round_data, self.miss_rate)
+        if plan is not None:
+            self._click_task = asyncio.create_task(self._click(*plan))
+
+    async def _click(self, delay, click):
+        await asyncio.sleep(delay)
+        now = time.time()
+        self._click_sent = time.perf_counter()
+        self.stats.clicks += 1
+        await self.sio.emit('player_click', dict(click, client_click=now, client_now=now))
+
+    async def on_click_result(self, data):
+        code = data[0] if isinstance(data, list) else data.get('code')
+        self.stats.codes[code] += 1
+        if self._click_sent is not None:
+            self.stats.click_latencies.append(time.perf_counter() - self._click_sent)
+            self._click_sent = None
+
+    async def on_round_end(self, data):
+        round_id = data[0] if isinstance(data, list) else data['round_id']
+        self.stats.rounds.add((self.lobby_id, round_id))
+        # Look at the results for a moment before getting ready again
+        await asyncio.sleep(random.uniform(*self.ready_delay))
+        if self.sio.connected:
+            await self.sio.emit('join_waiting_room')
+
+    async def on_lobby_redirect(self, data):
+        # Sharded lobbies need a client per worker; point --url at the owner instead
+        self.stats.errors += 1
+
+
+def _format(value, pattern):
+    return '-' if value is None else pattern.format(value)
+
+
+async def run(args):
+    stats = LoadStats()
+    players = []
+    base_rss, base_threads = process_stats(args.server_pid)
+    print(f'{"clients":>8} {"rounds/s":>9} {"clicks":>7} {"p50 ms":>7} {"p99 ms":>7} '
+          f'{"busy":>5} {"errors":>6} {"rss MB":>14} {"threads":>10}')
+    try:
+        for target in args.clients:
+            # Connect the new clients in batches so the server sees a ramp, not a spike
+            new_players = [SimulatedPlayer(index, args, stats) for index in range(len(players), target)]
+            for start in range(0, len(new_players), args.connect_batch):
+                batch = new_players[start:start + args.connect_batch]
+                outcomes = await asyncio.gather(*(player.start() for player in batch), return_exceptions=True)
+                stats.errors += sum(isinstance(outcome, Exception) for outcome in outcomes)
+            players.extend(new_players)
+
+            stats.reset()
+            started = time.monotonic()
+            await asyncio.sleep(args.stage_duration)
+            elapsed = time.monotonic() - started
+
+            rss, threads = process_stats(args.server_pid)
+            p50 = percentile(stats.click_latencies, 0.5)
+            p99 = percentile(stats.click_latencies, 0.99)
+            rss_column = _format(rss, '{:.1f}') + (f' ({rss - base_rss:+.1f})' if rss and base_rss else '')
+            threads_column = _format(threads, '{}') + (f' ({threads - base_threads:+d})'
+                                                        if threads and base_threads else '')
+            print(f'{len(players):>8} {len(stats.rounds) / elapsed:>9.2f} {stats.clicks:>7} '
+                  f'{_format(p50 and p50 * 1000, "{:.1f}"):>7} {_format(p99 and p99 * 1000, "{:.1f}"):>7} '
+                  f'{stats.codes[ResultCode.BUSY]:>5} {stats.errors:>6} {rss_column:>14} {threads_column:>10}',
+                  flush=True)
+    finally:
+        await asyncio.gather(*(player.stop() for player in players), return_exceptions=True)
+
+
+def parse_args():
+    """Parse load generator command line options"""
+    parser = argparse.ArgumentParser(description='Simulated players for load testing a local server')
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--clients', default='100,500,1000',
+                        type=lambda value: [int(count) for count in value.split(',')],
+                        help='Comma separated client counts to ramp through')
+    parser.add_argument('--stage-duration', type=float, default=30.0,
+                        help='Seconds to measure at each client count')
+    parser.add_argument('--lobbies', type=int, default=1,
+                        help='Spread clients over this many lobbies (1 plays in the default lobby)')
+    parser.add_argument('--lobby-prefix', default='load-')
+    parser.add_argument('--username-prefix', default='bot-')
+    parser.add_argument('--protocol', choices=protocol.ENCODINGS, default=protocol.JSON)
+    parser.add_argument('--miss-rate', type=float, default=0.05,
+                        help='Chance a player doesn\'t click in a round')
+    parser.add_argument('--ready-delay', type=float, nargs=2, default=(0.5, 2.0), metavar=('MIN', 'MAX'),
+                        help='Seconds a player waits after round_end before getting ready again')
+    parser.add_argument('--connect-batch', type=int, default=50,
+                        help='Clients connected concurrently while ramping up')
+    parser.add_argument('--server-pid', type=int,
+                        help='Pid of a local server to report memory and thread growth for')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    asyncio.run(run(parse_args()))
@@ -0,0 +1,283 @@
+import hashlib
+import os
+import re
+import threading
+import uuid
+import protocol
+from clock_sync import ClockSync
+from cluster import HashRing
+from game_manager import GameManager
+from scheduler import RoundScheduler
+
+class LobbyManager:
+    """Owns many independent games (lobbies) hosted by one server process"""
+
+    DEFAULT_LOBBY_ID = 'main'
+    PLAYER_COUNT_INTERVAL = 1.0  # Seconds player_count broadcasts are coalesced over
+    LOBBY_IDLE_TIMEOUT = 300.0   # Seconds a created lobby may wait for its first player
+
+    def __init__(self, scheduler=None, worker_id=None, workers=None, history_dir=None, stats_store=None,
+                 player_count_interval=PLAYER_COUNT_INTERVAL, lobby_idle_timeout=LOBBY_IDLE_TIMEOUT):
+        # One scheduler drives the rounds of every lobby
+        self.scheduler = scheduler or RoundScheduler()
+        # Client clock offsets are per connection, so every lobby shares one estimator
+        self.clock = ClockSync()
+        self._clock_timer = None
+        self._snapshot_timer = None
+        # Joins and leaves within an interval share one player_count broadcast
+        self.player_count_interval = player_count_interval
+        self._player_count_timer = None
+        self._player_count_lock = threading.Lock()
+        self._last_player_count = None  # Last count broadcast, to skip unchanged ones
+        # Cluster layout: lobbies are sharded across workers by consistent hash
+        self.worker_id = worker_id
+        # Room of every client connected to this process. The count only covers
+        # this worker's players, so it must not reach other workers' clients
+        # through the message queue.
+        self.player_count_room = f'player_count:{worker_id or uuid.uuid4().hex}'
+        self.workers = workers or {}  # worker_id -> public URL
+        self.ring = HashRing(self.workers) if self.workers else None
+        # Each lobby spills its round history to its own subdirectory
+        self.history_dir = history_dir
+        # Durable player stats shared by every lobby (optional)
+        self.stats_store = stats_store
+        self.socketio = None
+        self.on_change = None     # Called whenever any lobby changes (see notify_change)
+        self.lobby_idle_timeout = lobby_idle_timeout
+        # Guards lobbies and player_lobbies: creating, routing and tearing down
+        # happen on concurrent handler threads. Taken before a lobby's own lock.
+        self._lock = threading.RLock()
+        self.lobbies = {}         # lobby_id -> GameManager
+        self.player_lobbies = {}  # player_id -> lobby_id
+        self.create_lobby(self.DEFAULT_LOBBY_ID)
+
+    def set_socketio(self, socketio_instance):
+        """Set the Flask-SocketIO instance for broadcasts in every lobby"""
+        self.socketio = socketio_instance
+        for lobby in self.lobbies.values():
+            lobby.set_socketio(socketio_instance)
+
+    def start_clock_sync(self, interval=ClockSync.PING_INTERVAL):
+        """Ping every connected player's clock in the background every interval seconds"""
+        if self._clock_timer is None:
+            self._clock_timer = self.scheduler.call_later(interval, self._ping_clocks, interval)
+
+    def _ping_clocks(self, interval):
+        for lobby in list(self.lobbies.values()):
+            lobby.ping_clocks()
+        self._clock_timer = self.scheduler.call_later(interval, self._ping_clocks, interval)
+
+    def start_snapshots(self, interval):
+        """Snapshot every lobby in the background every interval seconds"""
+        if self._snapshot_timer is None and interval > 0:
+            self._snapshot_timer = self.scheduler.call_later(interval, self._save_snapshots, interval)
+
+    def _save_snapshots(self, interval):
+        self.save_snapshots()
+        self._snapshot_timer = self.scheduler.call_later(interval, self._save_snapshots, interval)
+
+    def save_snapshots(self, wait=False):
+        """Snapshot every lobby; with wait, block until every file is written"""
+        for lobby in list(self.lobbies.values()):
+            lobby.save_snapshot(wait=wait)
+
+    def create_lobby(self, lobby_id=None):
+        """Create a new empty lobby and return its game manager"""
+        while lobby_id is None:
+            lobby_id = uuid.uuid4().hex[:8]
+            # Only hand out ids this worker hosts
+            if not self.is_local_lobby(lobby_id):
+                lobby_id = None
+        with self._lock:
+            if lobby_id in self.lobbies:
+                return self.lobbies[lobby_id]
+
+            history_dir = self.get_history_dir(lobby_id)
+            lobby = GameManager(lobby_id=lobby_id, scheduler=self.scheduler, clock=self.clock,
+                                history_dir=history_dir, stats_store=self.stats_store,
+                                snapshot_path=os.path.join(history_dir, 'snapshot.bin') if history_dir else None)
+            lobby.set_socketio(self.socketio)
+            lobby.on_change = self.notify_change
+            self.lobbies[lobby_id] = lobby
+        # A lobby nobody joins would otherwise never be torn down
+        if lobby_id != self.DEFAULT_LOBBY_ID and self.lobby_idle_timeout:
+            self.scheduler.call_later(self.lobby_idle_timeout, self._reap_idle_lobby, lobby)
+        self.notify_change()
+        return lobby
+
+    def _reap_idle_lobby(self, lobby):
+        """Tear down a lobby that is still empty once its idle timeout is up"""
+        with self._lock:
+            if self.lobbies.get(lobby.lobby_id) is not lobby or lobby.players:
+                return
+            self._pop_lobby(lobby.lobby_id)
+        self._shutdown_lobby(lobby)
+
+    def get_history_dir(self, lobby_id):
+        """Directory a lobby's round history spills to, or None if history isn't kept on disk"""
+        if not self.history_dir:
+            return None
+        # Lobby ids come from clients; anything that isn't a plain name is hashed
+        if not re.fullmatch(r'[A-Za-z0-9_-]{1,64}', lobby_id):
+            lobby_id = hashlib.md5(lobby_id.encode('utf-8')).hexdigest()
+        return os.path.join(self.history_dir, lobby_id)
+
+    def get_lobby_owner(self, lobby_id):
+        """Get the worker id that hosts lobby_id, or None when not clustered"""
+        if self.ring is None:
+            return None
+        return self.ring.get_node(lobby_id or self.DEFAULT_LOBBY_ID)
+
+    def is_local_lobby(self, lobby_id):
+        """Check whether lobby_id is hosted by this worker"""
+        owner = self.get_lobby_owner(lobby_id)
+        return owner is None or owner == self.worker_id
+
+    def get_lobby(self, lobby_id):
+        """Get a lobby by id, or None if it doesn't exist"""
+        return self.lobbies.get(lobby_id)
+
+    def get_or_create_lobby(self, lobby_id=None):
+        """Get a lobby by id, creating it on first use"""
+        with self._lock:
+            return self.get_lobby(lobby_id or self.DEFAULT_LOBBY_ID) or self.create_lobby(lobby_id)
+
+    def remove_lobby(self, lobby_id):
+        """Tear down a lobby and forget its players"""
+        if lobby_id == self.DEFAULT_LOBBY_ID:
+            return False
+
+        with self._lock:
+            lobby = self._pop_lobby(lobby_id)
+        if lobby is None:
+            return False
+        self._shutdown_lobby(lobby)
+        return True
+
+    def _pop_lobby(self, lobby_id):
+        """Unregister a lobby and its players; the caller holds the lock and
+        shuts the returned lobby down once it has released it"""
+        lobby = self.lobbies.pop(lobby_id, None)
+        if lobby is not None:
+            for player_id in list(lobby.players):
+                self.player_lobbies.pop(player_id, None)
+        return lobby
+
+    def _shutdown_lobby(self, lobby):
+        """Stop a popped lobby. Runs outside the lock: shutdown waits for the
+        snapshot write, which would otherwise stall every join and leave.
+        A lobby recreated with the same id meanwhile may load the previous
+        snapshot instead of this one."""
+        lobby.shutdown()
+        self.notify_change()
+
+    def get_player_lobby(self, player_id):
+        """Get the lobby a connected player belongs to, or None"""
+        lobby_id = self.player_lobbies.get(player_id)
+        if lobby_id is None:
+            return None
+        return self.lobbies.get(lobby_id)
+
+    def add_player(self, player_id, username, lobby_id=None, encoding=protocol.JSON):
+        """Add a player to a lobby, moving them out of any lobby they were in"""
+        emptied = None
+        with self._lock:
+            current = self.get_player_lobby(player_id)
+            if current is not None and current.lobby_id != (lobby_id or self.DEFAULT_LOBBY_ID):
+                _, emptied = self._remove_player(player_id)
+            # Resolved after the move, which may have torn the old lobby down
+            lobby = self.get_or_create_lobby(lobby_id)
+
+            # If username already exists in this lobby, drop the old connection's routing
+            old_player_id = lobby.username_to_id.get(username)
+            if old_player_id is not None and old_player_id != player_id:
+                self.player_lobbies.pop(old_player_id, None)
+
+            success = lobby.add_player(player_id, username, encoding)
+            if success:
+                self.player_lobbies[player_id] = lobby.lobby_id
+        if emptied is not None:
+            self._shutdown_lobby(emptied)
+        if success:
+            self.notify_change()
+            self.schedule_player_count()
+        return success
+
+    def remove_player(self, player_id):
+        """Remove a player from their lobby and tear the lobby down once empty"""
+        with self._lock:
+            if self.get_player_lobby(player_id) is None:
+                self.player_lobbies.pop(player_id, None)
+                return False
+            removed, emptied = self._remove_player(player_id)
+        if emptied is not None:
+            self._shutdown_lobby(emptied)
+        self.notify_change()
+        self.schedule_player_count()
+        return removed
+
+    def _remove_player(self, player_id):
+        """Remove a player under the lock; returns whether they were removed
+        and the lobby popped because it emptied, for the caller to shut down"""
+        lobby = self.get_player_lobby(player_id)
+        self.player_lobbies.pop(player_id, None)
+        removed = lobby.remove_player(player_id)
+        # Checked under the lock, so nobody can be joining the lobby meanwhile
+        if lobby.players or lobby.lobby_id == self.DEFAULT_LOBBY_ID:
+            return removed, None
+        return removed, self._pop_lobby(lobby.lobby_id)
+
+    def get_player_count(self):
+        """Get the number of players across all lobbies"""
+        return len(self.player_lobbies)
+
+    def get_lobby_count(self):
+        """Get the number of active lobbies"""
+        return len(self.lobbies)
+
+    def schedule_player_count(self):
+        """Broadcast the player count once the current interval ends; every
+        join/leave until then is folded into that one broadcast"""
+        with self._player_count_lock:
+            if self._player_count_timer is None:
+                self._player_count_timer = self.scheduler.call_later(
+                    self.player_count_interval, self._broadcast_player_count)
+
+    def _broadcast_player_count(self):
+        with self._player_count_lock:
+            self._player_count_timer = None
+            count = self.get_player_count()
+            if count == self._last_player_count or self.socketio is None:
+                return
+            self._last_player_count = count
+        self.socketio.emit('player_count', {'count': count}, room=self.player_count_room)
+
+    def notify_change(self):
+        """Tell the on_change listener that players, lobbies or rounds changed"""
+        if self.on_change is not None:
+            self.on_change()
+
+    def get_lobby_stats(self):
+        """Per-lobby summary keyed by lobby id"""
+        return {lobby_id: lobby.get_lobby_stats() for lobby_id, lobby in list(self.lobbies.items())}
+
+    def get_round_type_stats(self):
+        """Round type totals summed over every lobby"""
+        totals = {}
+        for lobby in list(self.lobbies.values()):
+            for round_type, stats in list(lobby.round_type_stats.items()):
+                total = totals.setdefault(round_type, dict.fromkeys(stats, 0))
+                for key, value in list(stats.items()):
+                    total[key] += value
+        return totals
+
+    def get_click_queue_stats(self):
+        """Click ingestion metrics summed over every lobby"""
+        totals = {}
+        for lobby in list(self.lobbies.values()):
+            for key, value in lobby.get_click_queue_stats().items():
+                if key in ('capacity', 'high_watermark'):
+                    totals[key] = max(totals.get(key, 0), value)
+                else:
+                    totals[key] = totals.get(key, 0) + value
+        return totals
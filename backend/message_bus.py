@@ -0,0 +1,171 @@
+"""Pub/sub backends that carry Socket.IO emits between server processes.
+
+Redis, RabbitMQ (Kombu) and Kafka are supported by python-socketio itself
+through a message queue URL. The managers here are stand-ins that need no
+external service, so several workers can be run and tested on one machine:
+
+- memory://           all Socket.IO servers created in this process share a bus
+- local://host:port   workers exchange messages through a tiny TCP broker
+                      (start one with `python message_bus.py --port 6390`)
+"""
+import argparse
+import pickle
+import queue
+import socket
+import socketserver
+import struct
+import threading
+
+import socketio
+
+_FRAME_HEADER = struct.Struct('>I')
+
+
+def _send_frame(sock, payload):
+    sock.sendall(_FRAME_HEADER.pack(len(payload)) + payload)
+
+
+def _recv_exact(sock, size):
+    buf = b''
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            return None
+        buf += chunk
+    return buf
+
+
+def _recv_frame(sock):
+    header = _recv_exact(sock, _FRAME_HEADER.size)
+    if header is None:
+        return None
+    return _recv_exact(sock, _FRAME_HEADER.unpack(header)[0])
+
+
+class InMemoryManager(socketio.PubSubManager):
+    """Client manager whose pub/sub bus lives in this process"""
+
+    name = 'memory'
+    _subscribers = {}  # channel -> list of queues, shared by every instance
+    _subscribers_lock = threading.Lock()
+
+    def __init__(self, url='memory://', channel='socketio', write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self._queue = queue.Queue()
+        with self._subscribers_lock:
+            self._subscribers.setdefault(channel, []).append(self._queue)
+
+    def _publish(self, data):
+        with self._subscribers_lock:
+            subscribers = list(self._subscribers.get(self.channel, ()))
+        for subscriber in subscribers:
+            subscriber.put(data)
+
+    def _listen(self):
+        while True:
+            yield self._queue.get()
+
+
+class LocalBusManager(socketio.PubSubManager):
+    """Client manager that publishes through a local TCP broker"""
+
+    name = 'local'
+
+    def __init__(self, url='local://127.0.0.1:6390', channel='socketio', write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        host, _, port = url.split('://', 1)[-1].partition(':')
+        self.address = (host or '127.0.0.1', int(port or 6390))
+        self._publisher = None
+        self._publisher_lock = threading.Lock()
+
+    def _connect(self, role):
+        sock = socket.create_connection(self.address)
+        _send_frame(sock, role)
+        return sock
+
+    def _publish(self, data):
+        payload = pickle.dumps((self.channel, data))
+        with self._publisher_lock:
+            if self._publisher is None:
+                self._publisher = self._connect(b'pub')
+            try:
+                _send_frame(self._publisher, payload)
+            except OSError:
+                # Broker restarted; reconnect once and retry
+                self._publisher = self._connect(b'pub')
+                _send_frame(self._publisher, payload)
+
+    def _listen(self):
+        while True:
+            try:
+                subscriber = self._connect(b'sub')
+            except OSError:
+                self.server.sleep(1)
+                continue
+            while True:
+                frame = _recv_frame(subscriber)
+                if frame is None:
+                    break
+                channel, data = pickle.loads(frame)
+                if channel == self.channel:
+                    yield data
+            subscriber.close()
+
+
+class _BrokerHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        broker = self.server
+        # Connections announce themselves; only subscribers receive the fan-out
+        if _recv_frame(self.request) == b'sub':
+            with broker.clients_lock:
+                broker.clients.add(self.request)
+        try:
+            while True:
+                frame = _recv_frame(self.request)
+                if frame is None:
+                    break
+                # Fan out to every subscriber, including the sender's own: Socket.IO
+                # servers apply their own emits when they read them back
+                with broker.clients_lock:
+                    clients = list(broker.clients)
+                for client in clients:
+                    try:
+                        _send_frame(client, frame)
+                    except OSError:
+                        pass
+        finally:
+            with broker.clients_lock:
+                broker.clients.discard(self.request)
+
+
+class LocalBroker(socketserver.ThreadingTCPServer):
+    """Minimal fan-out broker for LocalBusManager"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=6390):
+        super().__init__((host, port), _BrokerHandler)
+        self.clients = set()
+        self.clients_lock = threading.Lock()
+
+
+def make_client_manager(url):
+    """Build a client manager for one of the stand-in bus URLs, or None for
+    URLs python-socketio handles itself (redis://, amqp://, kafka://)"""
+    if not url:
+        return None
+    if url.startswith('memory://'):
+        return InMemoryManager(url)
+    if url.startswith('local://'):
+        return LocalBusManager(url)
+    return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local message broker for multi-worker testing')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6390)
+    args = parser.parse_args()
+    print(f"Local message broker listening on {args.host}:{args.port}")
+    LocalBroker(args.host, args.port).serve_forever()
@@ -0,0 +1,170 @@
+"""Process-wide metrics rendered in the Prometheus text exposition format.
+
+Recording is meant to stay on in production, so it takes no locks: a
+histogram observation is one bisect into preallocated bounds plus two
+in-place increments, and counters/gauges are plain attribute updates. Under
+the GIL a concurrent increment can very rarely be lost, which metrics
+tolerate. Values that already live elsewhere (thread count, queue depth) are
+read through callbacks when /metrics is scraped instead of being tracked.
+"""
+import bisect
+import math
+
+# Seconds; from sub-millisecond click handling up to multi-second scoring
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FANOUT_BUCKETS = (1, 10, 100, 1000, 10000, 100000)
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return '+Inf' if value > 0 else '-Inf'
+        return repr(value)
+    return str(value)
+
+
+def _format_labels(names, values, extra=''):
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    """Monotonic total, or one read from a callback at scrape time"""
+    __slots__ = ('value', 'callback')
+
+    def __init__(self, callback=None):
+        self.value = 0
+        self.callback = callback
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def get(self):
+        return self.callback() if self.callback is not None else self.value
+
+
+class Gauge(Counter):
+    """Value that goes up and down, or one read from a callback at scrape time"""
+    __slots__ = ()
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+
+class Histogram:
+    """Observation counts in fixed buckets, preallocated up front"""
+    __slots__ = ('bounds', 'counts', 'sum')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # Last bucket is +Inf
+        self.sum = 0.0
+
+    def observe(self, value):
+        # bisect_left puts a value equal to a bound in that bound's bucket (le)
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class Metric:
+    """A named metric with optional labels; each label combination is a child"""
+
+    def __init__(self, kind, name, description, labels=(), make=None):
+        self.kind = kind
+        self.name = name
+        self.description = description
+        self.label_names = tuple(labels)
+        self._make = make
+        self._children = {}  # label values -> Counter/Gauge/Histogram
+        if not self.label_names:
+            self._children[()] = make()
+
+    def labels(self, *values):
+        """Child for these label values, created on first use"""
+        child = self._children.get(values)
+        if child is None:
+            child = self._children.setdefault(values, self._make())
+        return child
+
+    # Unlabelled metrics record straight on their only child
+    def inc(self, amount=1):
+        self._children[()].inc(amount)
+
+    def dec(self, amount=1):
+        self._children[()].dec(amount)
+
+    def set(self, value):
+        self._children[()].set(value)
+
+    def observe(self, value):
+        self._children[()].observe(value)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} {self.kind}']
+        for values, child in sorted(self._children.items()):
+            if self.kind != 'histogram':
+                lines.append(f'{self.name}{_format_labels(self.label_names, values)} {_format_value(child.get())}')
+                continue
+            # Copy first so the cumulative counts and total agree with each other
+            counts = list(child.counts)
+            cumulative = 0
+            for bound, count in zip(child.bounds + (math.inf,), counts):
+                cumulative += count
+                le = 'le="' + _format_value(float(bound)) + '"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.label_names, values, le)} {cumulative}')
+            labels = _format_labels(self.label_names, values)
+            lines.append(f'{self.name}_sum{labels} {_format_value(child.sum)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return '\n'.join(lines)
+
+
+class Registry:
+    """Every metric of the process, in registration order"""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f'Metric {metric.name} is already registered')
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, description, labels=(), callback=None):
+        return self._register(Metric('counter', name, description, labels, lambda: Counter(callback)))
+
+    def gauge(self, name, description, labels=(), callback=None):
+        return self._register(Metric('gauge', name, description, labels, lambda: Gauge(callback)))
+
+    def histogram(self, name, description, labels=(), buckets=LATENCY_BUCKETS):
+        bounds = tuple(sorted(buckets))
+        return self._register(Metric('histogram', name, description, labels, lambda: Histogram(bounds)))
+
+    def render(self):
+        """All metrics in the text exposition format"""
+        return '\n'.join(metric.render() for metric in list(self._metrics.values())) + '\n'
+
+
+registry = Registry()
+
+# Hot-path metrics recorded by the game managers
+CLICK_LATENCY = registry.histogram(
+    'clickgame_click_processing_seconds', 'Time from a click arriving to its result, by round type',
+    labels=('round_type',))
+PHASE_DRIFT = registry.histogram(
+    'clickgame_round_phase_drift_seconds', 'How late a round became active compared to its planned delay',
+    labels=('round_type',))
+END_ROUND = registry.histogram(
+    'clickgame_end_round_seconds', 'Time to score and broadcast a finished round, by round type',
+    labels=('round_type',))
+BROADCAST_FANOUT = registry.histogram(
+    'clickgame_broadcast_recipients', 'Players a lobby broadcast goes out to, by event',
+    labels=('event',), buckets=FANOUT_BUCKETS)
+BROADCAST_TIME = registry.histogram(
+    'clickgame_broadcast_seconds', 'Time spent emitting a lobby broadcast, by event',
+    labels=('event',))
@@ -0,0 +1,61 @@
+"""Real OS threads and locks, even under eventlet/gevent monkey-patching.
+
+Background work that blocks in C (SQLite commits, snapshot writes, the
+profiler's sampling loop) has to run on an OS thread of its own: on a green
+thread it would stall the hub and every socket with it. Anything such a
+thread shares with the green threads is guarded with native locks too.
+"""
+import importlib
+import sys
+
+
+def original(module_name, name):
+    """Standard library function as it was before eventlet/gevent patched it"""
+    if 'eventlet' in sys.modules:
+        from eventlet import patcher
+        return getattr(patcher.original(module_name), name)
+    if 'gevent' in sys.modules:
+        from gevent import monkey
+        return monkey.get_original(module_name, name)
+    return getattr(importlib.import_module(module_name), name)
+
+
+def allocate_lock():
+    """A lock that blocks the OS thread, not just the green thread"""
+    return original('_thread', 'allocate_lock')()
+
+
+def simple_queue():
+    """An unbounded FIFO whose get() blocks the OS thread; put() never blocks,
+    so green threads can hand work to an OS thread through it"""
+    return original('queue', 'SimpleQueue')()
+
+
+class Thread:
+    """The part of threading.Thread the background writers use, always
+    started on an OS thread"""
+
+    def __init__(self, target, args=()):
+        self._target = target
+        self._args = args
+        self._done = allocate_lock()  # Held while the thread runs
+        self._started = False
+
+    def start(self):
+        self._done.acquire()
+        self._started = True
+        original('_thread', 'start_new_thread')(self._run, ())
+
+    def _run(self):
+        try:
+            self._target(*self._args)
+        finally:
+            self._done.release()
+
+    def is_alive(self):
+        return self._started and self._done.locked()
+
+    def join(self):
+        if self._started:
+            with self._done:
+                pass
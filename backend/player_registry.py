@@ -0,0 +1,333 @@
+from array import array
+from collections.abc import Mapping
+
+# NumPy is optional; batch scoring falls back to a plain loop without it
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_EMPTY = -1    # SlotIndex entry never used
+_DELETED = -2  # SlotIndex entry of a removed key; probing continues past it
+
+
+class SlotIndex:
+    """Hash index from a key to its slot, in a single int32 array.
+
+    Keys aren't stored: each entry is a slot, and a probe compares the key
+    with the column the slots index (player ids or usernames). An entry costs
+    4 bytes at a load of at most 2/3, where a dict entry costs ten times that.
+    The key must be removed before the column entry it points at changes.
+    """
+    __slots__ = ('_keys', '_table', '_mask', '_live', '_used')
+
+    def __init__(self, keys):
+        self._keys = keys
+        self._live = 0  # Keys in the index
+        self._used = 0  # Entries that aren't _EMPTY (keys plus tombstones)
+        self._allocate(8)
+
+    def _allocate(self, size):
+        self._table = array('i', [_EMPTY]) * size
+        self._mask = size - 1
+
+    def __len__(self):
+        return self._live
+
+    def get(self, key):
+        """Slot of key, or None"""
+        table, keys, mask = self._table, self._keys, self._mask
+        i = hash(key) & mask
+        while True:
+            slot = table[i]
+            if slot == _EMPTY:
+                return None
+            if slot >= 0 and keys[slot] == key:
+                return slot
+            i = (i + 1) & mask
+
+    def add(self, key, slot):
+        """Index a key that isn't in the index yet"""
+        if (self._used + 1) * 3 > len(self._table) * 2:
+            self._rebuild()
+        table, mask = self._table, self._mask
+        i = hash(key) & mask
+        while table[i] >= 0:
+            i = (i + 1) & mask
+        if table[i] == _EMPTY:
+            self._used += 1
+        table[i] = slot
+        self._live += 1
+
+    def remove(self, key):
+        """Drop a key; returns its slot, or None if it wasn't indexed"""
+        table, keys, mask = self._table, self._keys, self._mask
+        i = hash(key) & mask
+        while True:
+            slot = table[i]
+            if slot == _EMPTY:
+                return None
+            if slot >= 0 and keys[slot] == key:
+                table[i] = _DELETED
+                self._live -= 1
+                return slot
+            i = (i + 1) & mask
+
+    def _rebuild(self):
+        # Grow (or just clear tombstones) so the table is at most half full
+        slots = [slot for slot in self._table if slot >= 0]
+        size = 8
+        while size < (len(slots) + 1) * 2:
+            size *= 2
+        self._allocate(size)
+        self._live = self._used = 0
+        keys = self._keys
+        for slot in slots:
+            self.add(keys[slot], slot)
+
+
+class UsernameIndex(Mapping):
+    """Read-only username -> player_id mapping over the registry's columns"""
+
+    def __init__(self, registry):
+        self._registry = registry
+
+    def __getitem__(self, username):
+        slot = self._registry._by_username.get(username)
+        if slot is None:
+            raise KeyError(username)
+        return self._registry.player_ids[slot]
+
+    def __iter__(self):
+        return (username for username in self._registry.usernames if username is not None)
+
+    def __len__(self):
+        return len(self._registry._by_username)
+
+
+class PlayerRecord:
+    """Read-only view of one player's slot, indexable like the old player dicts"""
+    __slots__ = ('_registry', 'player_id', 'slot')
+
+    def __init__(self, registry, player_id, slot):
+        self._registry = registry
+        self.player_id = player_id
+        self.slot = slot
+
+    def __getitem__(self, field):
+        column = self._registry._columns.get(field)
+        if column is None:
+            raise KeyError(field)
+        value = column[self.slot]
+        return bool(value) if field == 'ready' else value
+
+    def get(self, field, default=None):
+        try:
+            return self[field]
+        except KeyError:
+            return default
+
+    def __repr__(self):
+        return f'PlayerRecord({self.player_id!r}, username={self["username"]!r}, avg_time={self["avg_time"]!r})'
+
+
+class PlayerRegistry(Mapping):
+    """Players of one lobby stored in parallel columns indexed by a stable slot.
+
+    Each player costs a few machine words in typed arrays instead of a dict
+    per player, and score updates write into the arrays in place. Players
+    are found by id and by username through SlotIndex tables rather than
+    dicts. Slots of removed players are reused. The registry is a read-only
+    mapping of player_id -> PlayerRecord, so round classes can keep iterating
+    it and reading player['username'] as before.
+    """
+
+    def __init__(self):
+        self._free = []             # slots of removed players, reused first
+        # Columns, one entry per slot
+        self.player_ids = []        # None for free slots
+        self.usernames = []
+        self.rounds_played = array('q')
+        self.avg_times = array('d')
+        self.ready = bytearray()
+        self._columns = {
+            'username': self.usernames,
+            'rounds_played': self.rounds_played,
+            'avg_time': self.avg_times,
+            'ready': self.ready
+        }
+        self._by_id = SlotIndex(self.player_ids)
+        self._by_username = SlotIndex(self.usernames)
+        self.username_to_id = UsernameIndex(self)  # username -> player_id
+
+    # Mapping interface (player_id -> PlayerRecord)
+    def __getitem__(self, player_id):
+        slot = self._by_id.get(player_id)
+        if slot is None:
+            raise KeyError(player_id)
+        return PlayerRecord(self, player_id, slot)
+
+    def __iter__(self):
+        return (player_id for player_id in self.player_ids if player_id is not None)
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __contains__(self, player_id):
+        return self._by_id.get(player_id) is not None
+
+    def _occupied(self):
+        """Slots of every registered player"""
+        return [slot for slot, player_id in enumerate(self.player_ids) if player_id is not None]
+
+    def add(self, player_id, username):
+        """Register a player with fresh stats, replacing any previous
+        connection with the same username. Returns the player's slot."""
+        old_player_id = self.username_to_id.get(username)
+        if old_player_id is not None and old_player_id != player_id:
+            self.remove(old_player_id)
+
+        slot = self._by_id.get(player_id)
+        if slot is not None:
+            # Re-registering connection: drop its old username
+            self._by_username.remove(self.usernames[slot])
+        elif self._free:
+            slot = self._free.pop()
+        else:
+            slot = len(self.player_ids)
+            self.player_ids.append(None)
+            self.usernames.append(None)
+            self.rounds_played.append(0)
+            self.avg_times.append(0.0)
+            self.ready.append(0)
+
+        if self.player_ids[slot] is None:
+            self.player_ids[slot] = player_id
+            self._by_id.add(player_id, slot)
+        self.usernames[slot] = username
+        self._by_username.add(username, slot)
+        self.rounds_played[slot] = 0
+        self.avg_times[slot] = 0.0
+        self.ready[slot] = 1
+        return slot
+
+    def remove(self, player_id):
+        """Free a player's slot. Returns False if they weren't registered."""
+        slot = self._by_id.remove(player_id)
+        if slot is None:
+            return False
+        self._by_username.remove(self.usernames[slot])
+        self.player_ids[slot] = None
+        self.usernames[slot] = None
+        self._free.append(slot)
+        return True
+
+    def slot(self, player_id):
+        """Stable slot index of a player, or None"""
+        return self._by_id.get(player_id)
+
+    def _slot(self, player_id):
+        slot = self._by_id.get(player_id)
+        if slot is None:
+            raise KeyError(player_id)
+        return slot
+
+    def username(self, player_id):
+        return self.usernames[self._slot(player_id)]
+
+    def avg_time(self, player_id):
+        return self.avg_times[self._slot(player_id)]
+
+    def get_rounds_played(self, player_id):
+        return self.rounds_played[self._slot(player_id)]
+
+    def set_ready(self, player_id, ready=True):
+        """Mark one player as ready (or not) for the next round"""
+        slot = self._by_id.get(player_id)
+        if slot is None:
+            return False
+        self.ready[slot] = 1 if ready else 0
+        return True
+
+    def set_all_ready(self, ready):
+        # Free slots are set too; add() resets them anyway
+        self.ready[:] = (b'\x01' if ready else b'\x00') * len(self.ready)
+
+    def all_ready(self):
+        """Whether every registered player is ready"""
+        ready = self.ready
+        return all(ready[slot] for slot in self._occupied())
+
+    def restore_stats(self, player_id, avg_time, rounds_played):
+        """Put back stats saved for a player before a restart"""
+        slot = self._slot(player_id)
+        self.avg_times[slot] = avg_time
+        self.rounds_played[slot] = rounds_played
+
+    def record_round(self, player_id, reaction_time):
+        """Fold a round's reaction time into the player's running average in
+        place. Returns the new average, or None if the player is gone."""
+        slot = self._by_id.get(player_id)
+        if slot is None:
+            return None
+        rounds = self.rounds_played[slot]
+        average = (self.avg_times[slot] * rounds + reaction_time) / (rounds + 1)
+        self.rounds_played[slot] = rounds + 1
+        self.avg_times[slot] = average
+        return average
+
+    def record_round_batch(self, slots, reaction_times, penalty):
+        """Fold one round into every registered player's running average.
+
+        slots/reaction_times are parallel columns of the recorded results
+        (slot -1 marks a player who left); everyone else is scored with the
+        penalty. With NumPy this is a single vectorized pass over the arrays.
+        """
+        if not len(self):
+            return
+        if np is not None:
+            self._record_round_numpy(slots, reaction_times, penalty)
+            return
+
+        round_times = [penalty] * len(self.player_ids)
+        for slot, reaction_time in zip(slots, reaction_times):
+            if slot >= 0:
+                round_times[slot] = reaction_time
+        avg_times = self.avg_times
+        rounds_played = self.rounds_played
+        for slot in self._occupied():
+            rounds = rounds_played[slot]
+            avg_times[slot] = (avg_times[slot] * rounds + round_times[slot]) / (rounds + 1)
+            rounds_played[slot] = rounds + 1
+
+    def _record_round_numpy(self, slots, reaction_times, penalty):
+        occupied = np.array(self._occupied(), dtype=np.int64)
+        round_times = np.full(len(self.player_ids), penalty)
+        slots = np.frombuffer(slots, dtype=np.int64) if len(slots) else np.empty(0, dtype=np.int64)
+        times = np.frombuffer(reaction_times, dtype=np.float64) if len(reaction_times) else np.empty(0)
+        valid = slots >= 0
+        round_times[slots[valid]] = times[valid]
+
+        # Views write straight into the array columns; they are released on return
+        # so the columns can grow again
+        avg_times = np.frombuffer(self.avg_times, dtype=np.float64)
+        rounds_played = np.frombuffer(self.rounds_played, dtype=np.int64)
+        rounds = rounds_played[occupied]
+        avg_times[occupied] = (avg_times[occupied] * rounds + round_times[occupied]) / (rounds + 1)
+        rounds_played[occupied] = rounds + 1
+
+    def stats_rows(self):
+        """(username, avg_time, rounds_played) of every player with a round played"""
+        usernames = self.usernames
+        avg_times = self.avg_times
+        rounds_played = self.rounds_played
+        return [(usernames[slot], avg_times[slot], rounds_played[slot])
+                for slot in self._occupied() if rounds_played[slot]]
+
+    def ranked_keys(self):
+        """Sorted (avg_time, player_id) keys of every player with a round played"""
+        player_ids = self.player_ids
+        avg_times = self.avg_times
+        rounds_played = self.rounds_played
+        return sorted((avg_times[slot], player_ids[slot])
+                      for slot in self._occupied() if rounds_played[slot])
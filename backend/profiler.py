@@ -0,0 +1,149 @@
+"""On-demand sampling profiler producing flamegraph-compatible collapsed stacks.
+
+While a session runs, a native thread snapshots every thread's Python stack
+with sys._current_frames() at a fixed interval. Game manager methods
+decorated with @profiled(phase) tag the samples taken while they run, so
+every stack is rooted at its lobby, round type and phase:
+
+    lobby:main;TicTacToeRound;start;start_next_round (game_manager.py:309);... 12
+
+Under eventlet/gevent the tags follow green threads, so two socket handlers
+sharing the hub's OS thread are told apart and a tagged green thread parked
+on I/O or a lock is sampled from its suspended frame.
+
+Untagged threads (socket I/O, idle workers) are rooted at `untagged`. Feed
+the output to flamegraph.pl or speedscope. Nothing is sampled and the
+decorator is a single flag check while no session is running.
+"""
+import collections
+import functools
+import os
+import sys
+import threading
+import time
+
+from native import original as _original
+
+_THIS_FILE = __file__  # Frames of the profiler itself are left out of the stacks
+
+
+def _green_getcurrent():
+    """greenlet.getcurrent when eventlet/gevent may run the app on green threads, else None"""
+    if 'eventlet' not in sys.modules and 'gevent' not in sys.modules:
+        return None
+    from greenlet import getcurrent
+    return getcurrent
+
+
+class SamplingProfiler:
+    """One profiling session at a time; samples accumulate into collapsed stacks"""
+
+    INTERVAL = 0.005     # Seconds between samples
+    MAX_DURATION = 60.0  # Longest session an admin can request
+
+    def __init__(self):
+        self.active = False
+        # Green thread (or OS thread id without green threads) -> (game manager,
+        # phase, OS thread id) while a tagged method runs
+        self._tags = {}
+        self._counts = collections.Counter()
+        self._labels = {}      # code object -> frame label, formatted once
+        self._lock = threading.Lock()
+        self._get_ident = _original('_thread', 'get_ident')
+        self._getcurrent = _green_getcurrent()
+        self._get_key = self._getcurrent or self._get_ident
+        self.samples = 0
+
+    def start(self, duration, interval=INTERVAL):
+        """Begin sampling for duration seconds. Returns False if a session is already running."""
+        with self._lock:
+            if self.active:
+                return False
+            self.active = True
+            self._counts = collections.Counter()
+            self.samples = 0
+        start_thread = _original('_thread', 'start_new_thread')
+        start_thread(self._run, (min(duration, self.MAX_DURATION), interval))
+        return True
+
+    def collapsed(self):
+        """Samples of the last session as `root;frame;... count` lines"""
+        return ''.join(f'{stack} {count}\n' for stack, count in sorted(self._counts.items()))
+
+    def tag(self, game, phase):
+        """Attribute this thread's samples to a lobby phase; returns the previous tag"""
+        key = self._get_key()
+        previous = self._tags.get(key)
+        self._tags[key] = (game, phase, self._get_ident())
+        return previous
+
+    def restore(self, previous):
+        key = self._get_key()
+        if previous is None:
+            self._tags.pop(key, None)
+        else:
+            self._tags[key] = previous
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+        return label
+
+    def _root(self, tag):
+        game, phase, _ = tag
+        current_round = game.current_round
+        round_type = current_round.__class__.__name__ if current_round is not None else 'none'
+        lobby_id = str(game.lobby_id).replace(';', '_')
+        return f'lobby:{lobby_id};{round_type};{phase}'
+
+    def _run(self, duration, interval):
+        sleep = _original('time', 'sleep')
+        own = self._get_ident()
+        deadline = time.monotonic() + duration
+        try:
+            while time.monotonic() < deadline:
+                frames = sys._current_frames()
+                frames.pop(own, None)
+                for key, tag in list(self._tags.items()):
+                    # A suspended green thread keeps its own frame; the running
+                    # one (and any OS thread) is on its OS thread's stack
+                    frame = key.gr_frame if self._getcurrent is not None else None
+                    if frame is None:
+                        frame = frames.pop(tag[2], None)
+                    if frame is not None:
+                        self._sample(frame, self._root(tag))
+                for frame in frames.values():
+                    self._sample(frame, 'untagged')
+                self.samples += 1
+                sleep(interval)
+        finally:
+            self.active = False
+
+    def _sample(self, frame, root):
+        stack = []
+        while frame is not None:
+            if frame.f_code.co_filename != _THIS_FILE:
+                stack.append(self._label(frame.f_code))
+            frame = frame.f_back
+        stack.append(root)
+        self._counts[';'.join(reversed(stack))] += 1
+
+
+profiler = SamplingProfiler()
+
+
+def profiled(phase):
+    """Tag profiler samples taken while the decorated GameManager method runs"""
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if not profiler.active:
+                return method(self, *args, **kwargs)
+            previous = profiler.tag(self, phase)
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                profiler.restore(previous)
+        return wrapper
+    return decorate
@@ -0,0 +1,123 @@
+"""Wire encodings for the hot Socket.IO events.
+
+Clients pick an encoding with the `protocol` field of `register_player`:
+
+- 'json' (default) sends the regular dict payloads.
+- 'compact' sends fixed positional arrays with integer result codes and
+  times in whole milliseconds. The frontend decodes them in
+  src/utils/protocol.js; keep both schemas in sync.
+
+Compact schemas:
+
+    click_result         [code, success, reaction_ms, brightness_error]
+    round_result         [round_id, code, success, reaction_ms, brightness_error]
+    round_start          [round_id, round_type_index, round_data]
+    round_end            [round_id, base_version, version, changed, removed]
+                         changed: [[player_id, username, avg_ms, rounds_played, rank], ...]
+    registration_status  [success, player_id, username, lobby_id, rank,
+                          round_in_progress, game_state]
+                         game_state: [leaderboard_version, leaderboard,
+                                      round_id, round_type_index, round_data]
+
+Trailing null fields are dropped.
+"""
+from round_types.result_codes import ResultCode
+from socket_json import PreEncoded
+
+JSON = 'json'
+COMPACT = 'compact'
+ENCODINGS = (JSON, COMPACT)
+
+# Index of each round class on the wire; append only
+ROUND_TYPES = ['ColorChangeRound', 'BrightnessRound', 'ClickBoxRound', 'DoubleTroubleRound', 'TicTacToeRound']
+_ROUND_TYPE_INDEX = {name: index for index, name in enumerate(ROUND_TYPES)}
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000)
+
+
+def _trim(fields):
+    while fields and fields[-1] is None:
+        fields.pop()
+    return fields
+
+
+def _round_data(round_data):
+    # Instructions are looked up from the round type on the client
+    return {key: value for key, value in round_data.items() if key != 'instructions'}
+
+
+def round_type_index(round_type):
+    """Wire index of a round class name"""
+    return _ROUND_TYPE_INDEX[round_type]
+
+
+def encode_round_data(round_data, encoding=JSON):
+    """A round's client data as sent inside round_start in the given encoding"""
+    return _round_data(round_data) if encoding == COMPACT else round_data
+
+
+def _result_fields(result):
+    success = result.get('success')
+    if success is None:
+        success = result.get('status') == 'success'
+    return [int(result.get('code', ResultCode.INVALID_CLICK)), int(success),
+            _ms(result.get('reaction_time')), result.get('brightness_error')]
+
+
+def _leaderboard_entry(entry):
+    return [entry['player_id'], entry['username'], _ms(entry['avg_time']),
+            entry['rounds_played'], entry.get('rank')]
+
+
+def encode_click_result(payload):
+    return _trim(_result_fields(payload))
+
+
+def encode_round_result(payload):
+    return _trim([payload['round_id']] + _result_fields(payload['result']))
+
+
+def encode_round_start(payload):
+    return [payload['round_id'], _ROUND_TYPE_INDEX[payload['round_type']], _round_data(payload['round_data'])]
+
+
+def encode_round_end(payload):
+    delta = payload['leaderboard_delta']
+    return [payload['round_id'], delta['base_version'], delta['version'],
+            [_leaderboard_entry(entry) for entry in delta['changed']], delta['removed']]
+
+
+def encode_game_state(state, encoding=JSON):
+    """The game_state of registration_status in the given encoding"""
+    if encoding != COMPACT:
+        return state
+    game_state = [state['leaderboard_version'], [_leaderboard_entry(entry) for entry in state['leaderboard']]]
+    if 'round_type' in state:
+        game_state += [state['round_id'], _ROUND_TYPE_INDEX[state['round_type']], _round_data(state['round_data'])]
+    return game_state
+
+
+def encode_registration_status(payload):
+    state = payload['game_state']
+    # A game state frame from the lobby's cache is already in compact form
+    game_state = state if isinstance(state, PreEncoded) else encode_game_state(state, COMPACT)
+    return _trim([int(payload['success']), payload['player_id'], payload['username'], payload['lobby_id'],
+                  payload.get('rank'), int(payload['round_in_progress']), game_state])
+
+
+ENCODERS = {
+    'click_result': encode_click_result,
+    'round_result': encode_round_result,
+    'round_start': encode_round_start,
+    'round_end': encode_round_end,
+    'registration_status': encode_registration_status,
+}
+
+
+def encode(event, payload, encoding=JSON):
+    """Encode an event payload for a client using the given encoding"""
+    if encoding == COMPACT and event in ENCODERS:
+        return ENCODERS[event](payload)
+    return payload
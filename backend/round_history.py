@@ -0,0 +1,215 @@
+"""Round history: a bounded ring buffer of recent rounds backed by an on-disk log.
+
+Rounds evicted from memory spill to an append-only log split into segment
+files. Each record is a length-prefixed compact JSON array:
+
+    [round_id, round_type_index, ended_at, players, results]
+    results: [[player_id, code, reaction_ms], ...]
+
+Every segment `<first_round_id>.log` has an `<first_round_id>.idx` next to it
+with one fixed-size (round_id, offset) entry per record, so a round is found
+with a binary search and read straight out of a memory-mapped segment.
+"""
+import bisect
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from collections import deque
+
+import protocol
+
+_RECORD_HEADER = struct.Struct('>I')
+_INDEX_ENTRY = struct.Struct('>qq')  # round_id, offset of the record in the segment
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000)
+
+
+def encode_record(round_id, round_type, players, results, ended_at=None):
+    """Compact record for a scored round"""
+    rows = [[player_id, int(result.get('code', 0)), _ms(result.get('reaction_time'))]
+            for player_id, result in results.items()]
+    return [round_id, protocol.ROUND_TYPES.index(round_type), ended_at or time.time(), players, rows]
+
+
+def decode_record(record):
+    """Readable form of a compact record"""
+    round_id, type_index, ended_at, players, rows = record
+    return {
+        'round_id': round_id,
+        'round_type': protocol.ROUND_TYPES[type_index],
+        'ended_at': ended_at,
+        'players': players,
+        'results': [
+            {'player_id': player_id, 'code': code,
+             'reaction_time': None if reaction_ms is None else reaction_ms / 1000}
+            for player_id, code, reaction_ms in rows
+        ]
+    }
+
+
+class _Segment:
+    """One log file, its (round_id, offset) index and a lazily refreshed map"""
+
+    def __init__(self, path):
+        self.path = path
+        self.index_path = path[:-len('.log')] + '.idx'
+        self.round_ids = array('q')
+        self.offsets = array('q')
+        self.size = os.path.getsize(path) if os.path.exists(path) else 0
+        self._map = None
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'rb') as index_file:
+                data = index_file.read()
+            # Cut off a torn trailing entry (crash mid-write) so appends stay aligned
+            whole = len(data) - len(data) % _INDEX_ENTRY.size
+            if whole != len(data):
+                os.truncate(self.index_path, whole)
+            for round_id, offset in _INDEX_ENTRY.iter_unpack(data[:whole]):
+                if offset < self.size:
+                    self.round_ids.append(round_id)
+                    self.offsets.append(offset)
+
+    def append(self, round_id, payload):
+        offset = self.size
+        with open(self.path, 'ab') as log_file:
+            log_file.write(_RECORD_HEADER.pack(len(payload)) + payload)
+        with open(self.index_path, 'ab') as index_file:
+            index_file.write(_INDEX_ENTRY.pack(round_id, offset))
+        self.size += _RECORD_HEADER.size + len(payload)
+        self.round_ids.append(round_id)
+        self.offsets.append(offset)
+
+    def read(self, position):
+        """Decode the record at a position in this segment's index"""
+        offset = self.offsets[position]
+        # The map only covers the file as it was when mapped; remap after appends
+        if self._map is None or len(self._map) < self.size:
+            self.close()
+            with open(self.path, 'rb') as log_file:
+                self._map = mmap.mmap(log_file.fileno(), 0, access=mmap.ACCESS_READ)
+        start = offset + _RECORD_HEADER.size
+        length = _RECORD_HEADER.unpack_from(self._map, offset)[0]
+        return json.loads(self._map[start:start + length])
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+
+class RoundHistory:
+    """Recent rounds in memory, older ones in a segmented append-only log.
+
+    Without a directory, rounds that fall out of the ring buffer are dropped.
+    """
+
+    CAPACITY = 100                    # Rounds kept in memory
+    SEGMENT_SIZE = 16 * 1024 * 1024   # Bytes per log segment before rolling over
+
+    def __init__(self, directory=None, capacity=CAPACITY, segment_size=SEGMENT_SIZE):
+        self.directory = directory
+        self.segment_size = segment_size
+        self._recent = deque(maxlen=capacity)  # compact records, oldest first
+        self._segments = []                    # oldest first
+        self._lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            for name in sorted(os.listdir(directory)):
+                if name.endswith('.log'):
+                    self._segments.append(_Segment(os.path.join(directory, name)))
+
+    def __len__(self):
+        return len(self._recent) + sum(len(segment.round_ids) for segment in self._segments)
+
+    @property
+    def last_round_id(self):
+        """Highest round id recorded, in memory or on disk (0 if none)"""
+        with self._lock:
+            if self._recent:
+                return self._recent[-1][0]
+            for segment in reversed(self._segments):
+                if segment.round_ids:
+                    return segment.round_ids[-1]
+            return 0
+
+    def append(self, round_id, round_type, players, results):
+        """Record a scored round, spilling the oldest one to disk when full"""
+        record = encode_record(round_id, round_type, players, results)
+        with self._lock:
+            if len(self._recent) == self._recent.maxlen:
+                self._spill(self._recent.popleft())
+            self._recent.append(record)
+
+    def flush(self):
+        """Spill every in-memory round to disk (e.g. before shutdown)"""
+        with self._lock:
+            while self._recent and self.directory is not None:
+                self._spill(self._recent.popleft())
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            for segment in self._segments:
+                segment.close()
+
+    def recent_records(self):
+        """Copy of the compact records still in memory, oldest first"""
+        with self._lock:
+            return list(self._recent)
+
+    def restore(self, records):
+        """Put back in-memory records saved in a snapshot, skipping any that
+        were spilled to disk before the snapshot was replaced"""
+        last_round_id = self.last_round_id
+        with self._lock:
+            for record in records:
+                if record[0] > last_round_id:
+                    if len(self._recent) == self._recent.maxlen:
+                        self._spill(self._recent.popleft())
+                    self._recent.append(record)
+
+    def get_round(self, round_id):
+        """A round by id, or None if it isn't recorded"""
+        with self._lock:
+            for record in self._recent:
+                if record[0] == round_id:
+                    return decode_record(record)
+            for segment in reversed(self._segments):
+                position = bisect.bisect_left(segment.round_ids, round_id)
+                if position < len(segment.round_ids) and segment.round_ids[position] == round_id:
+                    return decode_record(segment.read(position))
+        return None
+
+    def page(self, before=None, limit=20):
+        """Up to limit rounds with round_id < before, newest first"""
+        rounds = []
+        with self._lock:
+            for record in reversed(self._recent):
+                if len(rounds) >= limit:
+                    return rounds
+                if before is None or record[0] < before:
+                    rounds.append(decode_record(record))
+            for segment in reversed(self._segments):
+                position = len(segment.round_ids) if before is None else bisect.bisect_left(segment.round_ids, before)
+                while position > 0 and len(rounds) < limit:
+                    position -= 1
+                    rounds.append(decode_record(segment.read(position)))
+                if len(rounds) >= limit:
+                    break
+        return rounds
+
+    def _spill(self, record):
+        # Lock held
+        if self.directory is None:
+            return
+        segment = self._segments[-1] if self._segments else None
+        if segment is None or segment.size >= self.segment_size:
+            segment = _Segment(os.path.join(self.directory, f'{record[0]:012d}.log'))
+            self._segments.append(segment)
+        segment.append(record[0], json.dumps(record, separators=(',', ':')).encode('utf-8'))
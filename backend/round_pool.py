@@ -0,0 +1,68 @@
+import threading
+from collections import deque
+
+import protocol
+from socket_json import PreEncoded
+
+class RoundPool:
+    """A few pre-built rounds of each type, ready to be started.
+
+    Constructing a round (random box positions, puzzle picks) and encoding
+    its client data for every wire encoding happen here ahead of time, on
+    the scheduler after the previous round started, so start_next_round only
+    pops a finished round and emits bytes that were already encoded. An empty
+    pool falls back to building the round on the spot.
+    """
+
+    SIZE = 2  # Rounds kept ready per round type
+
+    def __init__(self, players, size=SIZE):
+        self.players = players
+        self.size = size
+        self._pools = {}  # round class -> deque of built rounds
+        self._fill_lock = threading.Lock()
+        # Counters for /api/status
+        self.hits = 0
+        self.misses = 0
+
+    def build(self, round_class):
+        """A new round with its client data encoded for every wire encoding"""
+        new_round = round_class(players=self.players)
+        client_data = new_round.get_client_data()
+        new_round.encoded_client_data = {
+            encoding: PreEncoded(protocol.encode_round_data(client_data, encoding))
+            for encoding in protocol.ENCODINGS
+        }
+        return new_round
+
+    def take(self, round_class):
+        """A ready round of this type, built now if none is waiting"""
+        pool = self._pools.get(round_class)
+        try:
+            ready = pool.popleft()
+        except (AttributeError, IndexError):
+            self.misses += 1
+            return self.build(round_class)
+        self.hits += 1
+        return ready
+
+    def fill(self, round_types):
+        """Top up every round type's pool (run in the background)"""
+        # One filler at a time; another caller's fill covers this one too
+        if not self._fill_lock.acquire(blocking=False):
+            return
+        try:
+            for round_class in round_types:
+                pool = self._pools.setdefault(round_class, deque())
+                while len(pool) < self.size:
+                    pool.append(self.build(round_class))
+        finally:
+            self._fill_lock.release()
+
+    def get_stats(self):
+        """Pool hit rate and rounds waiting"""
+        return {
+            'ready': sum(len(pool) for pool in list(self._pools.values())),
+            'hits': self.hits,
+            'misses': self.misses
+        }
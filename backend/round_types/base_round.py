@@ -1,38 +1,158 @@
 import time
 from abc import ABC, abstractmethod
+from array import array
+from .result_codes import ResultCode
 
 class BaseRound(ABC):
+    MAX_CLICK_LATENCY = 1.0  # A click can't claim to be older than this on arrival (seconds)
+    NO_CLICK_PENALTY = 10.0  # Reaction time scored for players without a timed result
+
     def __init__(self, players):
         self.start_time = None
         self.active_time = None  # When the actual interaction should happen
         self.player_results = {}  # player_id -> result data
         self.round_config = {}    # Configuration for this round
         self.players = players
-        
+        self.awaiting = set()     # Players in the round who don't have a result yet
+        self.clock = None         # ClockSync with per-player clock offsets, set by the game manager
+        # Columnar copy of the recorded results for batch scoring: the player's
+        # registry slot (-1 once they leave), reaction time and result code
+        self.result_slots = array('q')
+        self.result_times = array('d')
+        self.result_codes = array('B')
+        self._result_rows = {}    # player_id -> row in the result columns
+        # Client data encoded per wire encoding ({encoding: PreEncoded}), set
+        # when the round is pre-built by a RoundPool
+        self.encoded_client_data = None
+
     @abstractmethod
     def get_client_data(self):
         """Return round data to send to clients for initialization"""
         pass
-    
-    @abstractmethod
-    def execute(self):
-        """Execute the round logic on the server"""
-        pass
-    
+
     @abstractmethod
     def process_click(self, player_id, data):
         """Process a player's click and return immediate feedback"""
         pass
-    
+
+    def process_clicks(self, clicks):
+        """Process a batch of (player_id, data) clicks in arrival order and
+        return their results. Rounds that can validate a whole batch at once
+        override this."""
+        return [self.process_click(player_id, data) for player_id, data in clicks]
+
+    def get_activation_delay(self):
+        """Seconds after the round starts before players may interact"""
+        return self.round_config.get('delay', 0)
+
+    def get_timeline(self):
+        """Return the (offset, phase) deadlines that drive this round.
+
+        Offsets are seconds from the round start. The game manager's scheduler
+        fires each phase at its deadline instead of the round sleeping on a thread.
+        """
+        delay = self.get_activation_delay()
+        end = self.round_config.get('max_duration', 15)  # Default 15s timeout
+
+        # Rounds with a success window can end as soon as it has elapsed
+        success_window = self.round_config.get('success_window')
+        if success_window is not None:
+            end = min(end, delay + success_window)
+
+        return [(delay, 'active'), (end, 'end')]
+
+    def start(self):
+        """Record the round start; later phases are driven by the scheduler"""
+        self.start_time = time.time()
+        self.awaiting = set(self.players)
+
+    def activate(self):
+        """Record the exact time when players may start interacting"""
+        self.active_time = time.time()
+
+    def get_server_time(self, data):
+        """Server time at which a click arrived. Clicks may be processed in a
+        later batch, so the time stamped on receipt is preferred over now."""
+        return data.get('server_received', time.time())
+
+    def adjust_client_time(self, player_id, client_time):
+        """Map a client timestamp onto the server clock using the player's
+        estimated clock offset. Returns None if there is no estimate yet."""
+        if self.clock is None or not isinstance(client_time, (int, float)):
+            return None
+        return self.clock.to_server_time(player_id, client_time)
+
+    def get_click_time(self, player_id, data):
+        """Server time at which the player clicked, so network latency doesn't
+        count as reaction time. Falls back to the arrival time when the client
+        clock hasn't been synced, and never trusts a click time later than its
+        arrival or more than MAX_CLICK_LATENCY before it."""
+        server_now = self.get_server_time(data)
+        click_time = self.adjust_client_time(player_id, data.get('client_click', data.get('client_now')))
+        if click_time is None:
+            return server_now
+        return min(server_now, max(click_time, server_now - self.MAX_CLICK_LATENCY))
+
+    def record_result(self, player_id, result):
+        """Store a player's result and stop waiting on them"""
+        self.player_results[player_id] = result
+        self.awaiting.discard(player_id)
+
+        reaction_time = result.get('reaction_time')
+        if reaction_time is None:
+            reaction_time = self.NO_CLICK_PENALTY
+        code = int(result.get('code', ResultCode.INVALID_CLICK))
+        row = self._result_rows.get(player_id)
+        if row is not None:
+            self.result_times[row] = reaction_time
+            self.result_codes[row] = code
+            return
+        slot = self.players.slot(player_id)
+        if slot is not None:
+            self._result_rows[player_id] = len(self.result_slots)
+            self.result_slots.append(slot)
+            self.result_times.append(reaction_time)
+            self.result_codes.append(code)
+
+    def discard_player(self, player_id):
+        """Stop waiting on a player who left mid-round"""
+        self.awaiting.discard(player_id)
+        # Their slot may be reused by a new player before the round is scored
+        row = self._result_rows.pop(player_id, None)
+        if row is not None:
+            self.result_slots[row] = -1
+
+    def get_result_columns(self):
+        """(slots, reaction_times, codes) of the recorded results. Players
+        without a row are scored with NO_CLICK_PENALTY."""
+        return self.result_slots, self.result_times, self.result_codes
+
+    def get_no_click_result(self):
+        """Result for a player who didn't click; shared by every such player"""
+        return {
+            'success': False,
+            'code': ResultCode.NO_CLICK,
+            'reaction_time': self.NO_CLICK_PENALTY
+        }
+
+    def get_player_result(self, player_id):
+        """Final result for one player, without building every player's result"""
+        result = self.player_results.get(player_id)
+        return self.get_no_click_result() if result is None else result
+
+    def all_players_done(self):
+        """Whether every player in the round has a result (O(1))"""
+        return self.start_time is not None and not self.awaiting
+
     def should_end(self):
         """Determine if the round should end based on current state"""
         # Default implementation: round ends after max_duration
         if self.start_time is None:
             return False
-            
+
         elapsed = time.time() - self.start_time
         return elapsed > self.round_config.get('max_duration', 15)  # Default 15s timeout
-    
+
     def get_results(self):
         """Get the final results for all players in this round"""
-        return self.player_results
\ No newline at end of file
+        return self.player_results
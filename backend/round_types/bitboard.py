@@ -0,0 +1,142 @@
+"""Bitboards for grid-based rounds.
+
+A player's pieces on a size x size grid are one integer with bit
+row * size + col set for every occupied cell. Every run of `connect` cells in
+a row, column or diagonal is precomputed as a line mask, so testing for a
+win, finding the cells that would complete a line or checking a move is a
+handful of integer ANDs with nothing allocated per call. With NumPy
+installed the *_many methods evaluate whole arrays of boards at once.
+"""
+
+# NumPy is optional; the batch methods fall back to plain loops without it
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def popcount(mask):
+    return bin(mask).count('1')
+
+
+def _single_bit(mask):
+    return mask != 0 and mask & (mask - 1) == 0
+
+
+class Grid:
+    """Cell and line masks of one grid shape, e.g. Grid(3) for tic-tac-toe or
+    Grid(5, connect=4) for a 5x5 connect-four variant"""
+
+    def __init__(self, size=3, connect=None):
+        self.size = size
+        self.connect = connect or size
+        self.cells = size * size
+        self.full = (1 << self.cells) - 1
+        # (row, col) -> bit, for turning clicks into masks without arithmetic
+        self.positions = {(row, col): 1 << (row * size + col) for row in range(size) for col in range(size)}
+        self.lines = tuple(self._lines())
+        self._line_array = np.array(self.lines, dtype=np.uint64) if np is not None and self.cells <= 64 else None
+
+    def _lines(self):
+        size, connect = self.size, self.connect
+        # Direction steps: right, down, down-right, down-left
+        for row_step, col_step in ((0, 1), (1, 0), (1, 1), (1, -1)):
+            for row in range(size):
+                for col in range(size):
+                    end_row = row + row_step * (connect - 1)
+                    end_col = col + col_step * (connect - 1)
+                    if 0 <= end_row < size and 0 <= end_col < size:
+                        yield sum(1 << ((row + row_step * i) * size + col + col_step * i) for i in range(connect))
+
+    def cell(self, row, col):
+        """Mask of a cell, or 0 if (row, col) is off the grid"""
+        return self.positions.get((row, col), 0)
+
+    def cell_position(self, mask):
+        """(row, col) of a single-cell mask"""
+        return divmod(mask.bit_length() - 1, self.size)
+
+    def wins(self, mask):
+        """Whether a player's cells complete a line"""
+        for line in self.lines:
+            if mask & line == line:
+                return True
+        return False
+
+    def winning_cells(self, own, other):
+        """Mask of the empty cells that would complete a line for own"""
+        empty = self.full & ~(own | other)
+        cells = 0
+        for line in self.lines:
+            gap = line & ~own
+            if gap & empty and gap & (gap - 1) == 0:
+                cells |= gap
+        return cells
+
+    def near_wins(self, own, other):
+        """Lines own could complete with one more piece"""
+        empty = self.full & ~(own | other)
+        return sum(1 for line in self.lines if _single_bit(line & ~own) and line & ~own & empty)
+
+    def blocked_wins(self, own, other):
+        """Lines own is one piece short of, with that cell taken by other"""
+        return sum(1 for line in self.lines if _single_bit(line & ~own) and line & ~own & other)
+
+    def symmetries(self):
+        """Cell permutations of the 8 rotations and reflections of the grid"""
+        size = self.size
+
+        def rotate(cells):
+            return [cells[(size - 1 - col) * size + row] for row in range(size) for col in range(size)]
+
+        def reflect(cells):
+            return [cells[row * size + size - 1 - col] for row in range(size) for col in range(size)]
+
+        permutations = []
+        cells = list(range(self.cells))
+        for _ in range(4):
+            permutations += [cells, reflect(cells)]
+            cells = rotate(cells)
+        return permutations
+
+    @staticmethod
+    def transform(permutation, mask):
+        return sum(1 << target for target, source in enumerate(permutation) if mask >> source & 1)
+
+    def canonical(self, own, other, permutations=None):
+        """Smallest (own | other << cells) over every symmetry; equal for boards
+        that are rotations or reflections of each other"""
+        return min(self.transform(permutation, own) | self.transform(permutation, other) << self.cells
+                   for permutation in permutations or self.symmetries())
+
+    def to_rows(self, own, other, marks=('X', 'O')):
+        """Board as a list of rows holding marks[0], marks[1] or None"""
+        size = self.size
+        return [[marks[0] if own >> cell & 1 else marks[1] if other >> cell & 1 else None
+                 for cell in range(row * size, row * size + size)] for row in range(size)]
+
+    # Batch evaluation over many boards
+
+    def wins_many(self, masks):
+        """Whether each board in masks completes a line"""
+        if self._line_array is None:
+            return [self.wins(mask) for mask in masks]
+        masks = np.asarray(masks, dtype=np.uint64)[:, None]
+        return ((masks & self._line_array) == self._line_array).any(axis=1)
+
+    def winning_cells_many(self, owns, others):
+        """winning_cells() of each (own, other) pair"""
+        if self._line_array is None:
+            return [self.winning_cells(own, other) for own, other in zip(owns, others)]
+        owns = np.asarray(owns, dtype=np.uint64)[:, None]
+        empty = np.uint64(self.full) & ~(owns | np.asarray(others, dtype=np.uint64)[:, None])
+        gaps = self._line_array & ~owns
+        single = (gaps != 0) & ((gaps & (gaps - np.uint64(1))) == 0)
+        completes = single & ((gaps & empty) != 0)
+        return np.bitwise_or.reduce(np.where(completes, gaps, np.uint64(0)), axis=1)
+
+    def check_moves(self, answers, moves):
+        """Whether each move mask hits its answer mask"""
+        if np is None:
+            return [bool(answer & move) for answer, move in zip(answers, moves)]
+        return (np.asarray(answers, dtype=np.uint64) & np.asarray(moves, dtype=np.uint64)) != 0
@@ -1,6 +1,7 @@
 import time
 import random
 from .base_round import BaseRound
+from .result_codes import ResultCode
 
 class BrightnessRound(BaseRound):
     def __init__(self, players):
@@ -25,39 +26,27 @@ class BrightnessRound(BaseRound):
             'max_duration': self.round_config['max_duration']
         }
     
-    def execute(self):
-        """Execute the round logic on the server"""
-        self.start_time = time.time()
-        
-        # Wait for the initial pause
-        time.sleep(self.round_config['initial_pause'])
-        
-        # Record when brightness starts changing
-        self.active_time = time.time()
-        print('done executing')
-        
-        # Wait for the remaining round time
-        remaining_time = self.round_config['max_duration'] - self.round_config['initial_pause']
-        if remaining_time > 0:
-            time.sleep(remaining_time)
+    def get_activation_delay(self):
+        """Brightness starts changing after the initial pause"""
+        return self.round_config['initial_pause']
+    
+    def get_timeline(self):
+        """Activate after the initial pause, end once the brightness change completes"""
+        delay = self.get_activation_delay()
+        end = min(self.round_config['max_duration'], delay + self.round_config['brightness_duration'])
+        return [(delay, 'active'), (end, 'end')]
     
     def process_click(self, player_id, data):
         """Process a player's click and return immediate feedback"""
         # Convert client timestamp to server timeline for fair comparison
-        server_now = time.time()
-        client_now = data.get('client_now', server_now)
-        client_click = data.get('client_click', server_now)
-        
-        # Adjust client click time to server timeline
-        time_diff = server_now - client_now
-        adjusted_click_time = client_click + time_diff
+        adjusted_click_time = self.get_click_time(player_id, data)
         
         # Determine if the click timing was valid
         if self.active_time is None or adjusted_click_time < self.active_time:
             # Clicked before brightness starts changing
             result = {
                 'success': False,
-                'message': 'Too early! The brightness hasn\'t started changing yet.',
+                'code': ResultCode.TOO_EARLY,
                 'reaction_time': 10.0,  # Penalty
                 'brightness_error': 100  # Maximum error
             }
@@ -69,7 +58,7 @@ class BrightnessRound(BaseRound):
                 # Clicked after brightness change completed
                 result = {
                     'success': False,
-                    'message': 'Too late! The brightness change has completed.',
+                    'code': ResultCode.TOO_LATE,
                     'reaction_time': time_into_brightness,
                     'brightness_error': 100  # Maximum error
                 }
@@ -89,27 +78,27 @@ class BrightnessRound(BaseRound):
                 if brightness_error < 5:
                     result = {
                         'success': True,
-                        'message': f'Perfect! You were only {brightness_error:.1f}% off the target.',
+                        'code': ResultCode.PERFECT,
                         'reaction_time': adjusted_reaction_time,
                         'brightness_error': brightness_error
                     }
                 elif brightness_error < 15:
                     result = {
                         'success': True,
-                        'message': f'Good! You were {brightness_error:.1f}% off the target.',
+                        'code': ResultCode.GOOD,
                         'reaction_time': adjusted_reaction_time,
                         'brightness_error': brightness_error
                     }
                 else:
                     result = {
                         'success': False,
-                        'message': f'Off target! You were {brightness_error:.1f}% off.',
+                        'code': ResultCode.OFF_TARGET,
                         'reaction_time': adjusted_reaction_time,
                         'brightness_error': brightness_error
                     }
         
         # Store result for this player
-        self.player_results[player_id] = result
+        self.record_result(player_id, result)
         
         return result
     
@@ -125,11 +114,20 @@ class BrightnessRound(BaseRound):
             return True
         
         # If all players have a result we can end early
-        if len(self.player_results) == len(self.players):
+        if self.all_players_done():
             return True
             
         return False
     
+    def get_no_click_result(self):
+        """No click also counts as the maximum brightness error"""
+        return {
+            'success': False,
+            'code': ResultCode.NO_CLICK,
+            'reaction_time': self.NO_CLICK_PENALTY,
+            'brightness_error': 100  # Maximum error
+        }
+    
     def get_results(self):
         """Get the final results for all players in this round, including those who didn't click"""
         # Get the default results for players who did click
@@ -138,10 +136,5 @@ class BrightnessRound(BaseRound):
         # Add default "no click" results for players who didn't click
         for player_id in self.players:
             if player_id not in results:
-                results[player_id] = {
-                    'success': False,
-                    'message': 'You didn\'t click during this round.',
-                    'reaction_time': 10.0,
-                    'brightness_error': 100  # Maximum error
-                }          
+                results[player_id] = self.get_no_click_result()
         return results
\ No newline at end of file
@@ -1,6 +1,7 @@
 import time
 import random
 from .base_round import BaseRound
+from .result_codes import ResultCode
 
 class ClickBoxRound(BaseRound):
     def __init__(self, players):
@@ -29,39 +30,17 @@ class ClickBoxRound(BaseRound):
             'position': self.position  # Random position for the box
         }
     
-    def execute(self):
-        """Execute the round logic on the server"""
-        self.start_time = time.time()
-        
-        # Sleep until the box should appear
-        time.sleep(self.round_config['delay'])
-        
-        # Record the exact time when the box appeared
-        self.active_time = time.time()
-        
-        # Wait for the remaining round time
-        remaining_time = self.round_config['max_duration'] - (self.active_time - self.start_time)
-        if remaining_time > 0:
-            time.sleep(remaining_time)
-    
     def process_click(self, player_id, data):
         """Process a player's click and return immediate feedback"""
         # Convert client timestamp to server timeline for fair comparison
-        server_now = time.time()
-        client_now = data.get('client_now', server_now)
-        client_click = data.get('client_click', server_now)
-        
-        # Adjust client click time to server timeline
-        time_diff = server_now - client_now
-        # adjusted_click_time = client_click + time_diff
-        adjusted_click_time = server_now
+        adjusted_click_time = self.get_click_time(player_id, data)
         
         # Determine if the click was valid
         if self.active_time is None:
             # Box hasn't appeared yet - too early!
             result = {
                 'success': False,
-                'message': 'Too early! The box hasn\'t appeared yet.',
+                'code': ResultCode.TOO_EARLY,
                 'reaction_time': 10.0  # Penalty value
             }
         else:
@@ -72,26 +51,26 @@ class ClickBoxRound(BaseRound):
                 # Clicked before box appeared (should be rare with adjusted time)
                 result = {
                     'success': False,
-                    'message': 'Too early! The box hadn\'t appeared yet.',
+                    'code': ResultCode.TOO_EARLY,
                     'reaction_time': 10.0  # Penalty value
                 }
             elif reaction_time <= self.round_config['success_window']:
                 # Valid click within success window
                 result = {
                     'success': True,
-                    'message': f'Nice! You clicked in {reaction_time:.3f} seconds.',
+                    'code': ResultCode.SUCCESS,
                     'reaction_time': reaction_time
                 }
             else:
                 # Too slow (beyond success window)
                 result = {
                     'success': False,
-                    'message': f'Too slow! You took {reaction_time:.3f} seconds.',
+                    'code': ResultCode.TOO_SLOW,
                     'reaction_time': reaction_time
                 }
         
         # Store result for this player
-        self.player_results[player_id] = result
+        self.record_result(player_id, result)
         
         return result
     
@@ -106,7 +85,7 @@ class ClickBoxRound(BaseRound):
             return True
         
         # If all players have a result we can end early
-        if len(self.player_results) == len(self.players):
+        if self.all_players_done():
             return True
             
         return False
@@ -119,9 +98,5 @@ class ClickBoxRound(BaseRound):
         # Add default "no click" results for players who didn't click
         for player_id in self.players:
             if player_id not in results:
-                results[player_id] = {
-                    'success': False,
-                    'message': 'You didn\'t click the box during this round.',
-                    'reaction_time': 10.0  # Penalty value for not clicking
-                }                
+                results[player_id] = self.get_no_click_result()
         return results
\ No newline at end of file
@@ -1,6 +1,7 @@
 import time
 import random
 from .base_round import BaseRound
+from .result_codes import ResultCode
 
 class ColorChangeRound(BaseRound):
     def __init__(self, players):
@@ -29,43 +30,21 @@ class ColorChangeRound(BaseRound):
             'delay': self.color_change_delay
         }
     
-    def execute(self):
-        """Execute the round logic on the server"""
-        self.start_time = time.time()
-        
-        # Sleep until the color should change
-        time.sleep(self.color_change_delay)
-        
-        # Record the exact time when the color changed
-        self.active_time = time.time()
-        
-        # Broadcast the color change event
-        # This would typically use socketio, but here we just record the time
-        
-        # Wait for the remaining round time
-        remaining_time = self.round_config['max_duration'] - (self.active_time - self.start_time)
-        if remaining_time > 0:
-            time.sleep(remaining_time)
+    def get_activation_delay(self):
+        """The color changes after this instance's random delay"""
+        return self.color_change_delay
     
     def process_click(self, player_id, data):
         """Process a player's click and return immediate feedback"""
         # Convert client timestamp to server timeline for fair comparison
-        # In a real implementation, you might want a more sophisticated sync mechanism
-        server_now = time.time()
-        client_now = data.get('client_now', server_now)
-        client_click = data.get('client_click', server_now)
-        
-        # Adjust client click time to server timeline
-        time_diff = server_now - client_now
-        # adjusted_click_time = client_click + time_diff
-        adjusted_click_time = server_now
+        adjusted_click_time = self.get_click_time(player_id, data)
         
         # Determine if the click was valid
         if self.active_time is None:
             # Color hasn't changed yet - too early!
             result = {
                 'success': False,
-                'message': 'Too early! The color hasn\'t changed yet.',
+                'code': ResultCode.TOO_EARLY,
                 'reaction_time': 10.0  # Penalty value
             }
         else:
@@ -76,26 +55,26 @@ class ColorChangeRound(BaseRound):
                 # Clicked before color change (should be rare with adjusted time)
                 result = {
                     'success': False,
-                    'message': 'Too early! The color hadn\'t changed yet.',
+                    'code': ResultCode.TOO_EARLY,
                     'reaction_time': 10.0  # Penalty value
                 }
             elif reaction_time <= self.round_config['success_window']:
                 # Valid click within success window
                 result = {
                     'success': True,
-                    'message': f'Nice! You reacted in {reaction_time:.3f} seconds.',
+                    'code': ResultCode.SUCCESS,
                     'reaction_time': reaction_time
                 }
             else:
                 # Too slow (beyond success window)
                 result = {
                     'success': False,
-                    'message': f'Too slow! You took {reaction_time:.3f} seconds.',
+                    'code': ResultCode.TOO_SLOW,
                     'reaction_time': reaction_time
                 }
         
         # Store result for this player
-        self.player_results[player_id] = result
+        self.record_result(player_id, result)
         
         return result
     
@@ -110,7 +89,7 @@ class ColorChangeRound(BaseRound):
             return True
         
         # If all players have a result we can end early
-        if len(self.player_results) == len(self.players):
+        if self.all_players_done():
             return True
             
         return False
@@ -123,9 +102,5 @@ class ColorChangeRound(BaseRound):
         # Add default "no click" results for players who didn't click
         for player_id in self.players:
             if player_id not in results:
-                results[player_id] = {
-                    'success': False,
-                    'message': 'You didn\'t click during this round.',
-                    'reaction_time': 10.0  # Penalty value for not clicking
-                }                
+                results[player_id] = self.get_no_click_result()
         return results
\ No newline at end of file
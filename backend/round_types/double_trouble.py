@@ -1,6 +1,7 @@
 import time
 import random
 from .base_round import BaseRound
+from .result_codes import ResultCode
 
 class DoubleTroubleRound(BaseRound):
     def __init__(self, players):
@@ -55,46 +56,25 @@ class DoubleTroubleRound(BaseRound):
             'bad_color': self.bad_color
         }
     
-    def execute(self):
-        """Execute the round logic on the server"""
-        self.start_time = time.time()
-        
-        # Sleep until the boxes should appear
-        time.sleep(self.round_config['delay'])
-        
-        # Record the exact time when the boxes appeared
-        self.active_time = time.time()
-        
-        # Wait for the remaining round time
-        remaining_time = self.round_config['max_duration'] - (self.active_time - self.start_time)
-        if remaining_time > 0:
-            time.sleep(remaining_time)
-    
     def process_click(self, player_id, data):
         """Process a player's click and return immediate feedback"""
         # Convert client timestamp to server timeline for fair comparison
-        server_now = time.time()
-        client_now = data.get('client_now', server_now)
-        client_click =  data.get('client_click', server_now)
+        adjusted_click_time = self.get_click_time(player_id, data)
         click_position = data.get('position', None)
         
-        # Adjust client click time to server timeline
-        time_diff = server_now - client_now
-        adjusted_click_time = server_now
-        
         # Determine if the click was valid
         if self.active_time is None:
             # Boxes haven't appeared yet - too early!
             result = {
                 'success': False,
-                'message': 'Too early! The boxes haven\'t appeared yet.',
+                'code': ResultCode.TOO_EARLY,
                 'reaction_time': 10.0  # Penalty value
             }
         elif click_position is None:
             # No position data
             result = {
                 'success': False,
-                'message': 'Invalid click detected.',
+                'code': ResultCode.INVALID_CLICK,
                 'reaction_time': 10.0  # Penalty value
             }
         else:
@@ -105,7 +85,7 @@ class DoubleTroubleRound(BaseRound):
                 # Clicked before boxes appeared (should be rare with adjusted time)
                 result = {
                     'success': False,
-                    'message': 'Too early! The boxes hadn\'t appeared yet.',
+                    'code': ResultCode.TOO_EARLY,
                     'reaction_time': 10.0  # Penalty value
                 }
             elif reaction_time <= self.round_config['success_window']:
@@ -120,26 +100,26 @@ class DoubleTroubleRound(BaseRound):
                     # Clicked closer to the good box
                     result = {
                         'success': True,
-                        'message': f'Nice! You clicked the correct box in {reaction_time:.3f} seconds.',
+                        'code': ResultCode.SUCCESS,
                         'reaction_time': reaction_time
                     }
                 else:
                     # Clicked closer to the bad box
                     result = {
                         'success': False,
-                        'message': 'Oops! You clicked the wrong box!',
+                        'code': ResultCode.WRONG_TARGET,
                         'reaction_time': 10.0  # Penalty for clicking the wrong box
                     }
             else:
                 # Too slow (beyond success window)
                 result = {
                     'success': False,
-                    'message': f'Too slow! You took {reaction_time:.3f} seconds.',
+                    'code': ResultCode.TOO_SLOW,
                     'reaction_time': reaction_time
                 }
         
         # Store result for this player
-        self.player_results[player_id] = result
+        self.record_result(player_id, result)
         
         return result
     
@@ -154,7 +134,7 @@ class DoubleTroubleRound(BaseRound):
             return True
         
         # If all players have a result we can end early
-        if len(self.player_results) == len(self.players):
+        if self.all_players_done():
             return True
             
         return False
@@ -167,9 +147,5 @@ class DoubleTroubleRound(BaseRound):
         # Add default "no click" results for players who didn't click
         for player_id in self.players:
             if player_id not in results:
-                results[player_id] = {
-                    'success': False,
-                    'message': 'You didn\'t click any box during this round.',
-                    'reaction_time': 10.0  # Penalty value for not clicking
-                }                
+                results[player_id] = self.get_no_click_result()
         return results
\ No newline at end of file
@@ -0,0 +1,152 @@
+"""Bank of tic-tac-toe puzzles: every reachable mid-game position, X to move,
+with exactly one winning move for X.
+
+The bank is generated offline (`python -m round_types.puzzle_bank` from the
+backend directory) into tic_tac_toe_puzzles.bin and loaded once at startup.
+Each puzzle is one packed 64-bit integer:
+
+    bits  0-8   cells holding X (bit = row * 3 + col)
+    bits  9-17  cells holding O
+    bits 18-21  winning cell
+    bits 22-24  distractors: lines with two O's and a gap (a tempting block)
+                plus lines with two X's blocked by an O
+    bits 32-47  symmetry class: puzzles that are rotations/reflections of
+                each other share one
+
+Puzzles are sorted by difficulty tier, so choosing one is a random index
+into the tier's range and checking an answer is a single mask compare.
+"""
+import os
+import random
+import struct
+import sys
+from array import array
+
+from .bitboard import Grid, popcount
+
+# Difficulty tiers and the fewest distractors a puzzle of each tier has
+TIERS = ('easy', 'medium', 'hard')
+TIER_DISTRACTORS = (0, 1, 3)
+
+GRID = Grid(3)
+FULL = GRID.full
+
+BANK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tic_tac_toe_puzzles.bin')
+MAGIC = b'CGTTT001'
+_HEADER = struct.Struct('<8s' + 'I' * len(TIERS))  # magic, puzzles per tier
+
+
+def pack(x, o, answer, distractors, symmetry_class):
+    return x | o << 9 | answer << 18 | min(distractors, 7) << 22 | symmetry_class << 32
+
+
+def unpack(puzzle):
+    """(x mask, o mask, winning cell, distractors, symmetry class)"""
+    return (puzzle & FULL, puzzle >> 9 & FULL, puzzle >> 18 & 0xF, puzzle >> 22 & 0x7, puzzle >> 32 & 0xFFFF)
+
+
+def tier_of(distractors):
+    """Index into TIERS of a puzzle with this many distractors"""
+    return max(tier for tier, least in enumerate(TIER_DISTRACTORS) if distractors >= least)
+
+
+def generate():
+    """Every puzzle, sorted by tier: lists of packed ints per tier"""
+    # Candidates: at least two X's and as many O's as X's (X to move)
+    xs, os_ = [], []
+    for x in range(1 << GRID.cells):
+        x_count = popcount(x)
+        if x_count < 2:
+            continue
+        rest = FULL & ~x
+        o = rest
+        while True:
+            if popcount(o) == x_count:
+                xs.append(x)
+                os_.append(o)
+            if o == 0:
+                break
+            o = (o - 1) & rest  # Next subset of the free cells
+
+    # Evaluate every candidate board in one batch
+    x_wins = GRID.wins_many(xs)
+    o_wins = GRID.wins_many(os_)
+    answers = GRID.winning_cells_many(xs, os_)
+
+    permutations = GRID.symmetries()
+    found = []
+    for x, o, x_won, o_won, answer in zip(xs, os_, x_wins, o_wins, answers):
+        answer = int(answer)
+        # Nobody has won yet and exactly one cell wins for X
+        if x_won or o_won or popcount(answer) != 1:
+            continue
+        distractors = GRID.near_wins(o, x) + GRID.blocked_wins(x, o)
+        found.append((x, o, answer.bit_length() - 1, distractors, GRID.canonical(x, o, permutations)))
+
+    class_ids = {canonical: index for index, canonical in enumerate(sorted({entry[4] for entry in found}))}
+    tiers = [[] for _ in TIERS]
+    for x, o, answer, distractors, canonical in sorted(found):
+        tiers[tier_of(distractors)].append(pack(x, o, answer, distractors, class_ids[canonical]))
+    return tiers
+
+
+def write_bank(path=BANK_PATH):
+    tiers = generate()
+    table = array('Q', [puzzle for tier in tiers for puzzle in tier])
+    if sys.byteorder != 'little':
+        table.byteswap()
+    with open(path, 'wb') as bank_file:
+        bank_file.write(_HEADER.pack(MAGIC, *(len(tier) for tier in tiers)))
+        bank_file.write(table.tobytes())
+    return tiers
+
+
+class PuzzleBank:
+    """Packed puzzles grouped by tier, picked in O(1)"""
+
+    def __init__(self, table, tier_counts):
+        self.table = table
+        # Puzzles of tier i are table[tier_ranges[i][0]:tier_ranges[i][1]]
+        self.tier_ranges = []
+        start = 0
+        for count in tier_counts:
+            self.tier_ranges.append((start, start + count))
+            start += count
+
+    @classmethod
+    def load(cls, path=BANK_PATH):
+        """Load the generated bank, or generate it in memory if the file is missing or stale"""
+        try:
+            with open(path, 'rb') as bank_file:
+                data = bank_file.read()
+            magic, *tier_counts = _HEADER.unpack_from(data)
+            if magic != MAGIC:
+                raise ValueError(f'{path} is not a puzzle bank')
+            table = array('Q')
+            table.frombytes(data[_HEADER.size:])
+            if sys.byteorder != 'little':
+                table.byteswap()
+            if len(table) != sum(tier_counts):
+                raise ValueError(f'{path} is truncated')
+        except (OSError, ValueError, struct.error) as e:
+            print(f'Generating tic-tac-toe puzzles ({e})')
+            tiers = generate()
+            table = array('Q', [puzzle for tier in tiers for puzzle in tier])
+            tier_counts = [len(tier) for tier in tiers]
+        return cls(table, tier_counts)
+
+    def __len__(self):
+        return len(self.table)
+
+    def pick(self, tier=None):
+        """A random packed puzzle from a tier (index into TIERS), or from any tier"""
+        if tier is None:
+            return self.table[random.randrange(len(self.table))]
+        start, end = self.tier_ranges[tier]
+        return self.table[random.randrange(start, end)]
+
+
+if __name__ == '__main__':
+    tiers = write_bank()
+    print(f'Wrote {sum(map(len, tiers))} puzzles to {BANK_PATH}: ' +
+          ', '.join(f'{len(tier)} {name}' for name, tier in zip(TIERS, tiers)))
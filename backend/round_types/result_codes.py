@@ -0,0 +1,23 @@
+from enum import IntEnum
+
+class ResultCode(IntEnum):
+    """Click/round outcome codes sent to clients instead of human readable messages.
+
+    The frontend maps each code to text in src/utils/protocol.js, so keep the
+    two lists in sync and never renumber an existing code.
+    """
+    SUCCESS = 1          # Valid click in time (reaction_time is set)
+    TOO_EARLY = 2        # Clicked before the round became active
+    TOO_SLOW = 3         # Clicked after the success window (reaction_time is set)
+    TOO_LATE = 4         # Clicked after the interaction had ended
+    NO_CLICK = 5         # Player didn't click during the round
+    WRONG_TARGET = 6     # Clicked the wrong box or made the wrong move
+    INVALID_CLICK = 7    # Click data was missing or malformed
+    ALREADY_CLICKED = 8  # Player already has a result this round
+    PERFECT = 9          # Brightness within 5% of the target
+    GOOD = 10            # Brightness within 15% of the target
+    OFF_TARGET = 11      # Brightness further off the target
+    NO_ROUND = 12        # No round in progress
+    NOT_REGISTERED = 13  # Click from an unknown player
+    OUTDATED_ROUND = 14  # Click for a round that already ended
+    BUSY = 15            # Click queue full; the click was dropped
@@ -1,6 +1,11 @@
 import time
 import random
 from .base_round import BaseRound
+from .puzzle_bank import GRID, PuzzleBank, TIERS, unpack
+from .result_codes import ResultCode
+
+# Loaded once; every round picks from the same packed table
+PUZZLES = PuzzleBank.load()
 
 class TicTacToeRound(BaseRound):
     def __init__(self, players):
@@ -13,112 +18,14 @@ class TicTacToeRound(BaseRound):
             'success_window': 7.0  # Time window for valid clicks after board appears (seconds)
         }
         
-        # Generate a random mid-game tic-tac-toe board with a winning move
-        self.board, self.winning_move = self._generate_board()
-        
-    def _generate_board(self):
-        """Generate a mid-game tic-tac-toe board with a winning move.
-        Return the board and the winning move position."""
-        
-        # Create possible board configurations with one winning move for X
-        board_configs = [
-            # Horizontal win setups
-            [['X', 'X', None], ['O', 'O', None], [None, None, None]],  # Top row win
-            [[None, None, None], ['X', 'X', None], ['O', 'O', None]],  # Middle row win
-            [[None, 'O', None], [None, 'O', None], ['X', 'X', None]],  # Bottom row win
-            
-            # Vertical win setups
-            [['X', 'O', None], ['X', 'O', None], [None, None, None]],  # Left column win
-            [[None, 'X', 'O'], [None, 'X', None], [None, None, 'O']],  # Middle column win
-            [['O', None, 'X'], [None, None, 'X'], [None, 'O', None]],  # Right column win
-            
-            # Diagonal win setups
-            [['X', None, 'O'], [None, 'X', 'O'], [None, None, None]],  # Main diagonal win
-            [['O', None, None], ['O', 'X', None], [None, None, 'X']],  # Anti-diagonal win
-            
-            # More complex setups
-            [['X', 'O', None], [None, 'X', 'O'], [None, None, None]],  # Diagonal with distraction
-            [['O', 'X', None], ['X', 'O', None], [None, None, None]],  # Complex setup
-            [[None, 'O', 'X'], [None, 'X', 'O'], [None, None, None]],  # Another complex setup
-        ]
-        
-        # Choose a random board configuration
-        board = random.choice(board_configs)
-        
-        # Find the winning move position (None position that completes three X's)
-        winning_position = None
-        
-        # Check rows
-        for i in range(3):
-            if board[i].count('X') == 2 and None in board[i]:
-                row, col = i, board[i].index(None)
-                # Verify this is a winning move
-                board[row][col] = 'X'  # Temporarily place X
-                if self._check_win(board, 'X'):
-                    winning_position = (row, col)
-                board[row][col] = None  # Reset the position
-                if winning_position:
-                    break
-        
-        # Check columns if no winning move found yet
-        if not winning_position:
-            for j in range(3):
-                column = [board[i][j] for i in range(3)]
-                if column.count('X') == 2 and None in column:
-                    col = j
-                    row = [board[i][j] for i in range(3)].index(None)
-                    # Verify this is a winning move
-                    board[row][col] = 'X'  # Temporarily place X
-                    if self._check_win(board, 'X'):
-                        winning_position = (row, col)
-                    board[row][col] = None  # Reset the position
-                    if winning_position:
-                        break
-        
-        # Check diagonals if no winning move found yet
-        if not winning_position:
-            # Main diagonal
-            diag = [board[i][i] for i in range(3)]
-            if diag.count('X') == 2 and None in diag:
-                idx = diag.index(None)
-                board[idx][idx] = 'X'  # Temporarily place X
-                if self._check_win(board, 'X'):
-                    winning_position = (idx, idx)
-                board[idx][idx] = None  # Reset the position
-                
-        if not winning_position:
-            # Anti-diagonal
-            anti_diag = [board[i][2-i] for i in range(3)]
-            if anti_diag.count('X') == 2 and None in anti_diag:
-                idx = anti_diag.index(None)
-                board[idx][2-idx] = 'X'  # Temporarily place X
-                if self._check_win(board, 'X'):
-                    winning_position = (idx, 2-idx)
-                board[idx][2-idx] = None  # Reset the position
-        
-        return board, winning_position
-    
-    def _check_win(self, board, player):
-        """Check if a player has won on the given board."""
-        # Check rows
-        for i in range(3):
-            if board[i].count(player) == 3:
-                return True
-                
-        # Check columns
-        for j in range(3):
-            if [board[i][j] for i in range(3)].count(player) == 3:
-                return True
-                
-        # Check main diagonal
-        if [board[i][i] for i in range(3)].count(player) == 3:
-            return True
-            
-        # Check anti-diagonal
-        if [board[i][2-i] for i in range(3)].count(player) == 3:
-            return True
-            
-        return False
+        # Pick a mid-game position with exactly one winning move for X from the
+        # precomputed bank, in a random difficulty tier
+        self.difficulty = random.randrange(len(TIERS))
+        x, o, answer, self.distractors, self.symmetry_class = unpack(PUZZLES.pick(self.difficulty))
+        self.answer_mask = 1 << answer
+        self.winning_move = GRID.cell_position(self.answer_mask)
+        # A fresh board per round, so rounds never share or mutate lists
+        self.board = GRID.to_rows(x, o)
         
     def get_client_data(self):
         """Return round data to send to clients for initialization"""
@@ -128,88 +35,104 @@ class TicTacToeRound(BaseRound):
             'max_duration': self.round_config['max_duration'],
             'delay': self.round_config['delay'],
             'board': self.board,
+            'difficulty': TIERS[self.difficulty],
             'winning_move': None  # We don't send the winning move to the client
         }
     
-    def execute(self):
-        """Execute the round logic on the server"""
-        self.start_time = time.time()
-        
-        # Sleep until the board should appear
-        time.sleep(self.round_config['delay'])
-        
-        # Record the exact time when the board appeared
-        self.active_time = time.time()
-        
-        # Wait for the remaining round time
-        remaining_time = self.round_config['max_duration'] - (self.active_time - self.start_time)
-        if remaining_time > 0:
-            time.sleep(remaining_time)
-    
     def process_click(self, player_id, data):
         """Process a player's click and return immediate feedback"""
+        return self._process_move(player_id, data, bool(self._move_mask(data) & self.answer_mask))
+    
+    def process_clicks(self, clicks):
+        """Process a batch of clicks, checking every move against the answer in one pass"""
+        hits = GRID.check_moves([self.answer_mask] * len(clicks), [self._move_mask(data) for _, data in clicks])
+        return [self._process_move(player_id, data, bool(hit)) for (player_id, data), hit in zip(clicks, hits)]
+    
+    @staticmethod
+    def _click_position(data):
+        """(row, col) of a click, or None if it is missing, malformed or off the board"""
+        position = data.get('position')
+        if not isinstance(position, dict):
+            return None
+        row, col = position.get('row'), position.get('col')
+        # bool is an int subclass, so compare the exact type
+        if type(row) is not int or type(col) is not int or not GRID.cell(row, col):
+            return None
+        return row, col
+
+    @staticmethod
+    def _move_mask(data):
+        """Cell mask of a click's position, 0 if it has none or is off the board"""
+        position = TicTacToeRound._click_position(data)
+        if position is None:
+            return 0
+        return GRID.cell(*position)
+    
+    def _process_move(self, player_id, data, hit):
+        """Result of a click whose move was already checked against the answer"""
         # Convert client timestamp to server timeline for fair comparison
-        server_now = time.time()
-        client_now = data.get('client_now', server_now)
-        client_delta = server_now - client_now
+        click_time = self.get_click_time(player_id, data)
         
         # Get the click position from data
-        if 'position' not in data:
-            return {'status': 'error', 'message': 'Missing position data'}
+        position = self._click_position(data)
+        if position is None:
+            return {'status': 'error', 'code': ResultCode.INVALID_CLICK}
             
-        click_row = data['position']['row']
-        click_col = data['position']['col']
+        click_row, click_col = position
         
         # Initialize response
-        result = {'status': 'error', 'message': 'Invalid click'}
+        result = {'status': 'error', 'code': ResultCode.INVALID_CLICK}
         
         # If the round hasn't started yet
         if self.active_time is None:
-            result = {'status': 'too_early', 'message': 'Board not active yet'}
+            result = {'status': 'too_early', 'code': ResultCode.TOO_EARLY}
             
         # If player already has a result, no need to process again
         elif player_id in self.player_results:
             existing_result = self.player_results[player_id]
             result = {
                 'status': existing_result['status'],
-                'message': 'You already clicked',
+                'code': ResultCode.ALREADY_CLICKED,
                 'reaction_time': existing_result.get('reaction_time')
             }
             
         # Check if the click is within the allowed time window
-        elif self.active_time and server_now - self.active_time <= self.round_config['success_window']:
+        elif self.active_time and click_time - self.active_time <= self.round_config['success_window']:
             # Calculate reaction time (adjusted for client-server time difference)
-            reaction_time = (client_now + client_delta) - self.active_time
+            reaction_time = max(click_time - self.active_time, 0)
             
             # Check if the click is on the winning move
-            if (click_row, click_col) == self.winning_move:
-                self.player_results[player_id] = {
+            if hit:
+                self.record_result(player_id, {
                     'status': 'success',
+                    'code': ResultCode.SUCCESS,
                     'reaction_time': reaction_time,
                     'position': {'row': click_row, 'col': click_col}
-                }
+                })
                 result = {
                     'status': 'success',
-                    'message': 'Correct move!',
+                    'code': ResultCode.SUCCESS,
                     'reaction_time': round(reaction_time, 3)
                 }
             else:
-                self.player_results[player_id] = {
+                self.record_result(player_id, {
                     'status': 'wrong_move',
+                    'code': ResultCode.WRONG_TARGET,
                     'reaction_time': None,
                     'position': {'row': click_row, 'col': click_col}
-                }
+                })
                 result = {
                     'status': 'wrong_move',
-                    'message': 'Incorrect move!',
+                    'code': ResultCode.WRONG_TARGET,
                 }
         else:
             # Click was too late
-            self.player_results[player_id] = {
+            self.record_result(player_id, {
                 'status': 'too_late',
+                'code': ResultCode.TOO_LATE,
                 'reaction_time': None
-            }
-            result = {'status': 'too_late', 'message': 'Too late!'}
+            })
+            result = {'status': 'too_late', 'code': ResultCode.TOO_LATE}
             
         return result
         
@@ -219,32 +142,38 @@ class TicTacToeRound(BaseRound):
         if self.start_time is None:
             return False
             
-        all_players_clicked = all(player_id in self.player_results for player_id in self.players)
+        all_players_clicked = self.all_players_done()
         elapsed = time.time() - self.start_time
         
         return all_players_clicked or elapsed > self.round_config['max_duration']
         
+    def get_no_click_result(self):
+        """Players who didn't click get no reaction time and no score"""
+        return {
+            'status': 'no_click',
+            'code': ResultCode.NO_CLICK,
+            'reaction_time': None,
+            'score': 0
+        }
+    
+    def get_player_result(self, player_id):
+        """Final result for one player, scored from their recorded click"""
+        result = self.player_results.get(player_id)
+        if result is None:
+            return self.get_no_click_result()
+        return {
+            'status': result['status'],
+            'code': result['code'],
+            'reaction_time': result.get('reaction_time'),
+            'score': self._calculate_score(result)
+        }
+        
     def get_results(self):
         """Get the final results for all players in this round"""
         final_results = {}
         
         for player_id, player_data in self.players.items():
-            if player_id in self.player_results:
-                result = self.player_results[player_id]
-                final_results[player_id] = {
-                    'username': player_data['username'],
-                    'status': result['status'],
-                    'reaction_time': result.get('reaction_time'),
-                    'score': self._calculate_score(result)
-                }
-            else:
-                # Player didn't click
-                final_results[player_id] = {
-                    'username': player_data['username'],
-                    'status': 'no_click',
-                    'reaction_time': None,
-                    'score': 0
-                }
+            final_results[player_id] = dict(self.get_player_result(player_id), username=player_data['username'])
                 
         # Add the winning move to the results
         final_results['winning_move'] = {'row': self.winning_move[0], 'col': self.winning_move[1]}
@@ -0,0 +1,133 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+class ScheduledCall:
+    """Handle for a callback queued on the scheduler"""
+
+    __slots__ = ('deadline', 'callback', 'args', 'cancelled')
+
+    def __init__(self, deadline, callback, args):
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        """Prevent the callback from running if it hasn't fired yet"""
+        self.cancelled = True
+
+
+class RoundScheduler:
+    """Single-threaded deadline scheduler that drives round phases.
+
+    Every round phase (activation, timeout, early end) is queued here as a
+    deadline instead of sleeping on a dedicated thread, so the number of
+    threads stays fixed no matter how many rounds are running.
+    """
+
+    def __init__(self):
+        self._queue = []  # heap of (deadline, sequence, ScheduledCall)
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def call_later(self, delay, callback, *args):
+        """Run callback(*args) on the scheduler thread after delay seconds"""
+        call = ScheduledCall(time.monotonic() + max(delay, 0), callback, args)
+        with self._condition:
+            heapq.heappush(self._queue, (call.deadline, next(self._sequence), call))
+            self._ensure_running()
+            # Wake the worker in case this deadline is earlier than the one it waits on
+            self._condition.notify()
+        return call
+
+    def call_soon(self, callback, *args):
+        """Run callback(*args) on the scheduler thread as soon as possible"""
+        return self.call_later(0, callback, *args)
+
+    def pending(self):
+        """Number of callbacks still queued (including cancelled ones not yet popped)"""
+        with self._condition:
+            return len(self._queue)
+
+    def _ensure_running(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='round-scheduler')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    if not self._queue:
+                        self._condition.wait()
+                        continue
+                    deadline, _, call = self._queue[0]
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        heapq.heappop(self._queue)
+                        break
+                    self._condition.wait(timeout)
+
+            if call.cancelled:
+                continue
+            try:
+                call.callback(*call.args)
+            except Exception as e:
+                # A failing phase must not take the scheduler down with it
+                print(f"Scheduled callback {call.callback!r} failed: {e!r}")
+
+
+class GreenScheduler:
+    """Deadline scheduler backed by the eventlet/gevent hub's own timers.
+
+    Used when the server runs in a green-thread async mode so round phases
+    never need an OS thread and never block the event loop.
+    """
+
+    def __init__(self, async_mode):
+        if async_mode == 'eventlet':
+            import eventlet
+            self._spawn_later = eventlet.spawn_after
+        elif async_mode == 'gevent':
+            import gevent
+            self._spawn_later = gevent.spawn_later
+        else:
+            raise ValueError(f"Unsupported green async mode: {async_mode}")
+        self._pending = 0
+
+    def call_later(self, delay, callback, *args):
+        """Run callback(*args) on a green thread after delay seconds"""
+        delay = max(delay, 0)
+        call = ScheduledCall(time.monotonic() + delay, callback, args)
+        self._pending += 1
+        self._spawn_later(delay, self._fire, call)
+        return call
+
+    def call_soon(self, callback, *args):
+        """Run callback(*args) on a green thread as soon as the hub gets to it"""
+        return self.call_later(0, callback, *args)
+
+    def pending(self):
+        """Number of callbacks that haven't fired yet"""
+        return self._pending
+
+    def _fire(self, call):
+        self._pending -= 1
+        if call.cancelled:
+            return
+        try:
+            call.callback(*call.args)
+        except Exception as e:
+            print(f"Scheduled callback {call.callback!r} failed: {e!r}")
+
+
+def make_scheduler(async_mode='threading'):
+    """Create the round scheduler that matches the server's async mode"""
+    if async_mode in ('eventlet', 'gevent'):
+        return GreenScheduler(async_mode)
+    return RoundScheduler()
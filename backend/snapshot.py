@@ -0,0 +1,156 @@
+"""Lobby snapshots for warm restarts.
+
+A snapshot file holds a small JSON header (round counters, recent history)
+followed by the player stats in columns, sorted by username:
+
+    magic | header length | header JSON | padding to 8 bytes
+    offsets        int64[count + 1]   byte offsets into the username blob
+    avg_times      float64[count]
+    rounds_played  int64[count]
+    usernames      utf-8 blob
+
+Loading maps the file and reads only the header, so it takes the same time
+for ten players or ten million; a returning player's stats are found with a
+binary search over the mapped usernames.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+
+MAGIC = b'CGSNAP01'
+_PREAMBLE = struct.Struct('>8sI')  # magic, header length
+
+
+def _align(size):
+    return (size + 7) & ~7
+
+
+def write_snapshot(path, header, rows):
+    """Atomically write a snapshot. rows are (username_bytes, avg_time,
+    rounds_played) tuples sorted by username."""
+    offsets = array('q', [0])
+    avg_times = array('d')
+    rounds_played = array('q')
+    blob = bytearray()
+    for username, avg_time, rounds in rows:
+        blob += username
+        offsets.append(len(blob))
+        avg_times.append(avg_time)
+        rounds_played.append(rounds)
+
+    header = dict(header, count=len(avg_times), byteorder=sys.byteorder)
+    header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    preamble = _PREAMBLE.pack(MAGIC, len(header_bytes)) + header_bytes
+    padding = b'\0' * (_align(len(preamble)) - len(preamble))
+
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'wb') as snapshot_file:
+        snapshot_file.write(preamble + padding)
+        snapshot_file.write(offsets.tobytes())
+        snapshot_file.write(avg_times.tobytes())
+        snapshot_file.write(rounds_played.tobytes())
+        snapshot_file.write(blob)
+        snapshot_file.flush()
+        os.fsync(snapshot_file.fileno())
+    # Readers keep the old file mapped until they reload; the swap is atomic
+    os.replace(temp_path, path)
+
+
+class Snapshot:
+    """Read-only, memory-mapped view of a snapshot file.
+
+    Stats are handed out once per username with take(); rows that haven't
+    been taken yet are carried over into the next snapshot.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as snapshot_file:
+            self._map = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, header_length = _PREAMBLE.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f'{path} is not a snapshot')
+        start = _PREAMBLE.size
+        self.header = json.loads(self._map[start:start + header_length])
+        if self.header['byteorder'] != sys.byteorder:
+            self._map.close()
+            raise ValueError(f'{path} was written on a {self.header["byteorder"]}-endian machine')
+
+        count = self.count = self.header['count']
+        position = _align(start + header_length)
+        blob_start = position + 8 * (count + 1) + 16 * count
+        # A short or damaged file must not be read as columns; the last offset
+        # is the length of the username blob that fills the rest of the file
+        if not isinstance(count, int) or count < 0 or blob_start > len(self._map) or \
+                struct.unpack_from('=q', self._map, position)[0] != 0 or \
+                struct.unpack_from('=q', self._map, position + 8 * count)[0] != len(self._map) - blob_start:
+            self._map.close()
+            raise ValueError(f'{path} is truncated or damaged')
+
+        view = memoryview(self._map)
+        self._offsets = view[position:position + 8 * (count + 1)].cast('q')
+        position += 8 * (count + 1)
+        self._avg_times = view[position:position + 8 * count].cast('d')
+        position += 8 * count
+        self._rounds_played = view[position:position + 8 * count].cast('q')
+        position += 8 * count
+        self._blob_start = position
+        self._taken = bytearray(count)  # 1 once a row was handed to a returning player
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path):
+        """Map the snapshot at path, or return None if there isn't a usable one"""
+        if path is None or not os.path.exists(path):
+            return None
+        try:
+            return cls(path)
+        except (ValueError, KeyError, TypeError, struct.error) as e:
+            print(f'Ignoring snapshot {path}: {e}')
+            return None
+
+    def _username(self, row):
+        start = self._blob_start + self._offsets[row]
+        return self._map[start:self._blob_start + self._offsets[row + 1]]
+
+    def find(self, username):
+        """Row of a username, or None"""
+        target = username.encode('utf-8')
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._username(middle) < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count and self._username(low) == target:
+            return low
+        return None
+
+    def take(self, username):
+        """(avg_time, rounds_played) saved for a username, at most once"""
+        row = self.find(username)
+        if row is None:
+            return None
+        with self._lock:
+            if self._taken[row]:
+                return None
+            self._taken[row] = 1
+        return self._avg_times[row], self._rounds_played[row]
+
+    def untaken_rows(self):
+        """(username_bytes, avg_time, rounds_played) of every row not handed out yet"""
+        for row in range(self.count):
+            if not self._taken[row]:
+                yield self._username(row), self._avg_times[row], self._rounds_played[row]
+
+    def close(self):
+        # Views into the map have to be released before it can be closed
+        for view in (self._offsets, self._avg_times, self._rounds_played):
+            view.release()
+        self._map.close()
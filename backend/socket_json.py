@@ -0,0 +1,82 @@
+"""JSON module for Socket.IO that splices in payloads encoded ahead of time.
+
+Passed to SocketIO(json=...), it replaces the standard library module used
+to serialize packets. Any PreEncoded value inside an emitted payload is
+written out verbatim instead of being serialized again, so data that is sent
+many times (a round's client data, say) is encoded once. PreEncoded values
+may nest, and a FrameCache keeps whole payloads encoded until the state they
+were built from changes.
+"""
+import json
+import os
+
+# Placeholder prefix for PreEncoded values; the NUL and the random nonce keep
+# it from ever matching text in a real payload
+_MARK = f'\x00{os.urandom(8).hex()}:'
+_ESCAPED_MARK = json.dumps(_MARK)[1:-1]
+
+
+class PreEncoded:
+    """A JSON value serialized once; value keeps the original for code that
+    needs to look inside it"""
+    __slots__ = ('value', 'json')
+
+    def __init__(self, value):
+        self.value = value
+        self.json = dumps(value, separators=(',', ':'))
+
+    def __repr__(self):
+        return f'PreEncoded({self.json})'
+
+
+def dumps(obj, **kwargs):
+    """json.dumps that writes PreEncoded values as they were encoded"""
+    spliced = []
+
+    def default(value):
+        if isinstance(value, PreEncoded):
+            spliced.append(value.json)
+            return f'{_MARK}{len(spliced) - 1}'
+        raise TypeError(f'Object of type {value.__class__.__name__} is not JSON serializable')
+
+    text = json.dumps(obj, default=default, **kwargs)
+    for index, encoded in enumerate(spliced):
+        text = text.replace(f'"{_ESCAPED_MARK}{index}"', encoded, 1)
+    return text
+
+
+
+def pre_encode(payload):
+    """payload as a PreEncoded value, unless it already is one"""
+    return payload if isinstance(payload, PreEncoded) else PreEncoded(payload)
+
+
+class FrameCache:
+    """Payloads encoded on first use and shared until cleared, keyed by
+    (event, encoding) or similar. The owner clears it whenever the state the
+    payloads were built from changes; callers synchronize access."""
+
+    def __init__(self):
+        self._frames = {}
+        # Counters for /api/status
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, build):
+        """The frame for key, built with build() and encoded on a miss"""
+        frame = self._frames.get(key)
+        if frame is None:
+            self.misses += 1
+            frame = self._frames[key] = pre_encode(build())
+        else:
+            self.hits += 1
+        return frame
+
+    def clear(self):
+        self._frames.clear()
+
+    def get_stats(self):
+        return {'cached': len(self._frames), 'hits': self.hits, 'misses': self.misses}
+
+
+loads = json.loads
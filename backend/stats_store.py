@@ -0,0 +1,140 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import native
+
+class StatsStore:
+    """Durable per-username player stats in SQLite.
+
+    Writes are write-behind: the game manager hands over one batch per scored
+    round and a background thread commits it in a single transaction. Reads go
+    through an LRU cache (and the batches not committed yet), so a returning
+    player's registration rarely touches the database. The writer runs on a
+    real OS thread, so commits never stall an eventlet/gevent hub.
+    """
+
+    CACHE_SIZE = 10000
+
+    def __init__(self, path, cache_size=CACHE_SIZE):
+        self.path = path
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # (lobby_id, username) -> (avg_time, rounds_played) or None
+        self._pending = {}           # same key -> stats queued but not committed yet
+        # Shared with the writer thread, so native rather than green primitives
+        self._lock = native.allocate_lock()
+        self._queue = native.simple_queue()
+        # Readers share one connection; the writer thread has its own
+        self._reader = self._connect()
+        self._reader_lock = threading.Lock()
+        self._reader.execute('''
+            CREATE TABLE IF NOT EXISTS player_stats (
+                lobby_id TEXT NOT NULL,
+                username TEXT NOT NULL,
+                avg_time REAL NOT NULL,
+                rounds_played INTEGER NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (lobby_id, username)
+            ) WITHOUT ROWID''')
+        self._reader.commit()
+        # Counters for /api/status
+        self.hits = 0
+        self.misses = 0
+        self.batches_written = 0
+        self._writer = native.Thread(target=self._write_loop)
+        self._writer.start()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    def get(self, lobby_id, username):
+        """(avg_time, rounds_played) saved for a player, or None"""
+        key = (lobby_id, username)
+        with self._lock:
+            if key in self._pending:
+                self.hits += 1
+                return self._pending[key]
+            if key in self._cache:
+                self.hits += 1
+                self._cache.move_to_end(key)
+                return self._cache[key]
+            self.misses += 1
+
+        with self._reader_lock:
+            row = self._reader.execute(
+                'SELECT avg_time, rounds_played FROM player_stats WHERE lobby_id = ? AND username = ?',
+                key).fetchone()
+        stats = tuple(row) if row else None
+
+        with self._lock:
+            # A round may have been scored while we were reading
+            if key in self._pending:
+                return self._pending[key]
+            self._cache[key] = stats
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return stats
+
+    def save_round(self, lobby_id, rows):
+        """Queue one round's (username, avg_time, rounds_played) rows for writing"""
+        if not rows:
+            return
+        now = time.time()
+        batch = [(lobby_id, username, avg_time, rounds_played, now) for username, avg_time, rounds_played in rows]
+        with self._lock:
+            cache = self._cache
+            for _, username, avg_time, rounds_played, _ in batch:
+                key = (lobby_id, username)
+                self._pending[key] = (avg_time, rounds_played)
+                if key in cache:
+                    cache[key] = (avg_time, rounds_played)
+        self._queue.put(batch)
+
+    def _write_loop(self):
+        writer = self._connect()
+        while True:
+            batch = self._queue.get()
+            if batch is None:
+                break
+            try:
+                with writer:
+                    writer.executemany('''
+                        INSERT INTO player_stats (lobby_id, username, avg_time, rounds_played, updated_at)
+                        VALUES (?, ?, ?, ?, ?)
+                        ON CONFLICT (lobby_id, username) DO UPDATE SET
+                            avg_time = excluded.avg_time,
+                            rounds_played = excluded.rounds_played,
+                            updated_at = excluded.updated_at''', batch)
+                self.batches_written += 1
+            except sqlite3.Error as e:
+                print(f"Error writing player stats: {e}")
+            # Committed rows can be read from the database again, unless a
+            # newer round queued fresher stats for the same player
+            with self._lock:
+                for lobby_id, username, avg_time, rounds_played, _ in batch:
+                    key = (lobby_id, username)
+                    if self._pending.get(key) == (avg_time, rounds_played):
+                        del self._pending[key]
+        writer.close()
+
+    def close(self):
+        """Write everything still queued and stop the writer"""
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+        with self._reader_lock:
+            self._reader.close()
+
+    def get_stats(self):
+        """Cache and write-behind metrics"""
+        return {
+            'cache_size': len(self._cache),
+            'hits': self.hits,
+            'misses': self.misses,
+            'pending_batches': self._queue.qsize(),
+            'batches_written': self.batches_written
+        }
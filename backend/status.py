@@ -0,0 +1,50 @@
+import hashlib
+import json
+import threading
+import time
+
+class StatusBoard:
+    """Pre-rendered /api/status bodies with ETags.
+
+    The game marks the board dirty on player joins/leaves and round
+    transitions; requests in between are served the cached body. Rebuilds
+    are rate-limited to one per MIN_INTERVAL however often the game changes,
+    and a body is refreshed after MAX_AGE anyway so live counters (queues,
+    caches) don't go stale.
+    """
+
+    MIN_INTERVAL = 0.5  # Seconds between rebuilds of the same view
+    MAX_AGE = 5.0       # Rebuild at least this often while being polled
+
+    def __init__(self, build, min_interval=MIN_INTERVAL, max_age=MAX_AGE):
+        self._build = build  # build(detail) -> JSON-serializable status
+        self.min_interval = min_interval
+        self.max_age = max_age
+        self._views = {}     # detail -> (built_at, generation, body, etag)
+        self._generation = 0 # Bumped on every change
+        self._lock = threading.Lock()
+
+    def mark_dirty(self):
+        """Note that the status changed; cheap enough to call under game locks"""
+        self._generation += 1
+
+    def get(self, detail=False):
+        """(body bytes, etag) of the current status"""
+        now = time.monotonic()
+        view = self._views.get(detail)
+        if view is not None:
+            built_at, generation, body, etag = view
+            age = now - built_at
+            if age < self.max_age and (generation == self._generation or age < self.min_interval):
+                return body, etag
+
+        with self._lock:
+            # Another request may have rebuilt it while we waited
+            view = self._views.get(detail)
+            if view is not None and view[0] > now:
+                return view[2], view[3]
+            generation = self._generation
+            body = json.dumps(self._build(detail), separators=(',', ':')).encode('utf-8')
+            etag = hashlib.md5(body).hexdigest()
+            self._views[detail] = (time.monotonic(), generation, body, etag)
+            return body, etag
@@ -0,0 +1,47 @@
+import unittest
+
+from player_registry import PlayerRegistry
+from round_types.result_codes import ResultCode
+from round_types.tic_tac_toe import TicTacToeRound
+
+
+class ProcessClicksTest(unittest.TestCase):
+    def setUp(self):
+        players = PlayerRegistry()
+        for index in range(8):
+            players.add(f'player-{index}', f'user-{index}')
+        self.round = TicTacToeRound(players)
+        self.round.start()
+        self.round.activate()
+
+    def click(self, row, col):
+        return {'position': {'row': row, 'col': col}}
+
+    def test_mixed_batch(self):
+        """Malformed clicks are answered INVALID_CLICK without failing the rest of the batch"""
+        row, col = self.round.winning_move
+        wrong_row, wrong_col = next((r, c) for r in range(3) for c in range(3) if (r, c) != (row, col))
+        batch = [
+            self.click(row, col),
+            {},
+            {'position': None},
+            self.click('1', 0),
+            self.click(True, 0),
+            self.click([1], 0),
+            self.click(3, 0),
+            self.click(wrong_row, wrong_col),
+        ]
+        clicks = [(f'player-{index}', data) for index, data in enumerate(batch)]
+
+        codes = [result['code'] for result in self.round.process_clicks(clicks)]
+
+        self.assertEqual(codes, [ResultCode.SUCCESS] + [ResultCode.INVALID_CLICK] * 6 + [ResultCode.WRONG_TARGET])
+        self.assertEqual(set(self.round.player_results), {'player-0', 'player-7'})
+
+    def test_move_mask_rejects_bad_positions(self):
+        for data in ({}, {'position': 'a1'}, self.click(None, 0), self.click(0, 1.5), self.click(-1, 0), self.click(0, 3)):
+            self.assertEqual(TicTacToeRound._move_mask(data), 0, data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,12 +1,32 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { io } from 'socket.io-client';
 import useLocalStorage from './hooks/useLocalStorage';
 import Game from './components/Game';
 import UsernameEntry from './components/UsernameEntry';
 import WaitingRoom from './components/WaitingRoom';
+import {
+  PROTOCOL,
+  decodeClickResult,
+  decodeRegistrationStatus,
+  decodeRoundEnd,
+  decodeRoundResult,
+  decodeRoundStart,
+} from './utils/protocol';
 import './styles/main.css';
 
 const BACKEND_URL = 'http://localhost:5000';
+// Optional lobby to join, e.g. http://localhost:3000/?lobby=friday-night
+const LOBBY_ID = new URLSearchParams(window.location.search).get('lobby');
+
+// Apply a round_end leaderboard delta: drop removed players, upsert changed entries
+function applyLeaderboardDelta(leaderboard, delta) {
+  const removed = new Set(delta.removed);
+  const changed = new Map(delta.changed.map((entry) => [entry.player_id, entry]));
+  const kept = leaderboard.filter(
+    (entry) => !removed.has(entry.player_id) && !changed.has(entry.player_id)
+  );
+  return [...kept, ...delta.changed].sort((a, b) => a.rank - b.rank);
+}
 
 function App() {
   // Game state
@@ -16,9 +36,13 @@ function App() {
   const [playerId, setPlayerId] = useState(null);
   const [playerCount, setPlayerCount] = useState(0);
   const [currentRound, setCurrentRound] = useState(null);
-  const [roundResults, setRoundResults] = useState(null);
+  const [roundResult, setRoundResult] = useState(null);
   const [leaderboard, setLeaderboard] = useState([]);
+  // Leaderboard version we hold; round_end deltas only apply on top of it
+  const leaderboardVersionRef = useRef(0);
   const [connected, setConnected] = useState(false);
+  // Server hosting our lobby; a worker may redirect us to the one that owns it
+  const [backendUrl, setBackendUrl] = useState(BACKEND_URL);
 
 
   // Initialize socket connection
@@ -27,7 +51,8 @@ function App() {
       socket.disconnect();
     }
 
-    const newSocket = io(BACKEND_URL);
+    // Pass the lobby so a load balancer can hash it to the worker that hosts it
+    const newSocket = io(backendUrl, { query: LOBBY_ID ? { lobby: LOBBY_ID } : {} });
 
     newSocket.on('connect', () => {
       console.log('Connected to server');
@@ -36,7 +61,7 @@ function App() {
 
       // If we already have a username, register with the server
       if (username) {
-        newSocket.emit('register_player', { username });
+        newSocket.emit('register_player', { username, lobby_id: LOBBY_ID, protocol: PROTOCOL });
       }
     });
 
@@ -46,19 +71,27 @@ function App() {
       setGameState('username');
     });
 
+    newSocket.on('lobby_redirect', (data) => {
+      console.log('Lobby hosted elsewhere, reconnecting to', data.url);
+      setBackendUrl(data.url);
+    });
+
     // Clean up on unmount
     return () => {
       newSocket.disconnect();
     };
-  }, []);
+  }, [backendUrl]);
 
   // Listen for game events once socket is established
   useEffect(() => {
     if (!socket) return;
 
-    socket.on('registration_status', (data) => {
+    socket.on('registration_status', (raw) => {
+      const data = decodeRegistrationStatus(raw);
       if (data.success) {
         setPlayerId(data.player_id);
+        setLeaderboard(data.game_state.leaderboard);
+        leaderboardVersionRef.current = data.game_state.leaderboard_version;
 
         // Determine if we should join a game in progress or wait
         if (data.round_in_progress) {
@@ -78,22 +111,45 @@ function App() {
       setPlayerCount(data.count);
     });
 
-    socket.on('round_start', (data) => {
+    socket.on('round_start', (raw) => {
+      const data = decodeRoundStart(raw);
       console.log('Round starting:', data);
       setGameState('playing');
       setCurrentRound(data);
-      setRoundResults(null);
+      setRoundResult(null);
     });
 
-    socket.on('round_end', (data) => {
+    socket.on('round_end', (raw) => {
+      const data = decodeRoundEnd(raw);
       console.log('Round ended:', data);
-      setRoundResults(data.results);
-      setLeaderboard(data.leaderboard);
+      const delta = data.leaderboard_delta;
+      if (delta.base_version === leaderboardVersionRef.current) {
+        leaderboardVersionRef.current = delta.version;
+        setLeaderboard((current) => applyLeaderboardDelta(current, delta));
+      } else {
+        // We missed a version (e.g. after a reconnect); fetch the full leaderboard
+        socket.emit('leaderboard_sync');
+      }
       setGameState('waiting');
 
     });
 
-    socket.on('click_result', (data) => {
+    socket.on('round_result', (raw) => {
+      setRoundResult(decodeRoundResult(raw).result);
+    });
+
+    socket.on('leaderboard_snapshot', (data) => {
+      leaderboardVersionRef.current = data.version;
+      setLeaderboard(data.leaderboard);
+    });
+
+    // Answer clock pings right away so the server can estimate our clock offset
+    socket.on('clock_ping', (data) => {
+      socket.emit('clock_pong', { t: data.t, client: Date.now() / 1000 });
+    });
+
+    socket.on('click_result', (raw) => {
+      const data = decodeClickResult(raw);
       console.log('Click result:', data);
       // This could be used to show immediate feedback
     });
@@ -105,7 +161,7 @@ function App() {
     setUsername(name);
 
     if (socket && connected) {
-      socket.emit('register_player', { username: name });
+      socket.emit('register_player', { username: name, lobby_id: LOBBY_ID, protocol: PROTOCOL });
     }
   };
 
@@ -116,12 +172,14 @@ function App() {
     }
   };
 
-  // Handle player click during a round
+  // Handle player click during a round. Rounds pass either the click time or
+  // an object with click details; the server maps client_click onto its clock.
   const handlePlayerClick = (data) => {
     if (socket && gameState === 'playing') {
+      const click = typeof data === 'number' ? { client_click: data } : data;
       socket.emit('player_click', {
-          ...data,
-          client_now: Date.now() / 1000        
+          ...click,
+          client_now: Date.now() / 1000
       });
     }
   };
@@ -139,7 +197,7 @@ function App() {
             username={username}
             playerId={playerId}
             onReady={handleReadyForNextRound}
-            roundResults={roundResults}
+            roundResult={roundResult}
             leaderboard={leaderboard}
           />
         );
@@ -1,35 +1,36 @@
 import React, { useEffect } from 'react';
 import Leaderboard from './Leaderboard';
 import { playNotification, playWelcomeMusic } from '../utils/audio';
+import { messageForCode } from '../utils/protocol';
 
-function WaitingRoom({ playerCount, username, playerId, onReady, roundResults, leaderboard }) {
+function WaitingRoom({ playerCount, username, playerId, onReady, roundResult, leaderboard }) {
 
 
   
   // Play notification when results are updated
   useEffect(() => {
-    if (roundResults) {
+    if (roundResult) {
       playNotification();
       playWelcomeMusic()
     }
-  }, [roundResults]);
+  }, [roundResult]);
 
   // Format player result if available
   const formatPlayerResult = () => {
-    if (!roundResults || !username) return null;
+    if (!roundResult || !username) return null;
     
-    // Find current player's result
-    const myResult = roundResults[playerId];
-    
-    if (!myResult) return null;
+    // The server only sends us our own result
+    const myResult = roundResult;
     
     return (
       <div className="player-result">
         <h3>Your Result</h3>
-        <p className={myResult.success ? "success-message" : "error-message"}>
-          {myResult.message}
+        <p className={myResult.success || myResult.status === 'success' ? "success-message" : "error-message"}>
+          {messageForCode(myResult)}
         </p>
-        <p>Reaction time: {myResult.reaction_time.toFixed(3)}s</p>
+        {myResult.reaction_time != null && (
+          <p>Reaction time: {myResult.reaction_time.toFixed(3)}s</p>
+        )}
       </div>
     );
   };
@@ -40,7 +41,7 @@ function WaitingRoom({ playerCount, username, playerId, onReady, roundResults, l
       <p>Players online: {playerCount}</p>
       
       {/* Show round results if available */}
-      {roundResults && (
+      {roundResult && (
         <div className="round-results">
           <h3>Last Round Results</h3>
           {formatPlayerResult()}
@@ -0,0 +1,151 @@
+// Decoders for the compact wire encoding (see backend/protocol.py for the schemas).
+// Every decoder also accepts the regular JSON payloads, so callers don't need to
+// know which encoding the server used.
+
+export const PROTOCOL = 'compact';
+
+// Index of each round class on the wire; must match ROUND_TYPES in backend/protocol.py
+const ROUND_TYPES = [
+  'ColorChangeRound',
+  'BrightnessRound',
+  'ClickBoxRound',
+  'DoubleTroubleRound',
+  'TicTacToeRound',
+];
+
+// Result codes; must match backend/round_types/result_codes.py
+export const ResultCode = {
+  SUCCESS: 1,
+  TOO_EARLY: 2,
+  TOO_SLOW: 3,
+  TOO_LATE: 4,
+  NO_CLICK: 5,
+  WRONG_TARGET: 6,
+  INVALID_CLICK: 7,
+  ALREADY_CLICKED: 8,
+  PERFECT: 9,
+  GOOD: 10,
+  OFF_TARGET: 11,
+  NO_ROUND: 12,
+  NOT_REGISTERED: 13,
+  OUTDATED_ROUND: 14,
+  BUSY: 15,
+};
+
+const seconds = (result) => `${result.reaction_time.toFixed(3)} seconds`;
+const brightnessOff = (result) => `${result.brightness_error.toFixed(1)}%`;
+
+const RESULT_MESSAGES = {
+  [ResultCode.SUCCESS]: (r) => (r.reaction_time != null ? `Nice! You reacted in ${seconds(r)}.` : 'Correct!'),
+  [ResultCode.TOO_EARLY]: () => 'Too early! Wait for the round to start.',
+  [ResultCode.TOO_SLOW]: (r) => `Too slow! You took ${seconds(r)}.`,
+  [ResultCode.TOO_LATE]: () => 'Too late!',
+  [ResultCode.NO_CLICK]: () => "You didn't click during this round.",
+  [ResultCode.WRONG_TARGET]: () => 'Oops! Wrong target!',
+  [ResultCode.INVALID_CLICK]: () => 'Invalid click detected.',
+  [ResultCode.ALREADY_CLICKED]: () => 'You already clicked.',
+  [ResultCode.PERFECT]: (r) => `Perfect! You were only ${brightnessOff(r)} off the target.`,
+  [ResultCode.GOOD]: (r) => `Good! You were ${brightnessOff(r)} off the target.`,
+  [ResultCode.OFF_TARGET]: (r) => `Off target! You were ${brightnessOff(r)} off.`,
+  [ResultCode.NO_ROUND]: () => 'No round in progress.',
+  [ResultCode.NOT_REGISTERED]: () => 'Player not registered.',
+  [ResultCode.OUTDATED_ROUND]: () => 'That round already ended.',
+  [ResultCode.BUSY]: () => 'Server busy, click dropped. Try again!',
+};
+
+// Instructions are not sent in the compact encoding
+const INSTRUCTIONS = {
+  click_box: () => 'A small box will appear after 3 seconds. Click it as fast as you can!',
+  color_change: () => "Click when the box changes color! Don't click too early.",
+  brightness: (data) => `Click when the brightness matches the target of ${data.target_brightness}%`,
+  double_trouble: () => 'Two colored boxes will appear. Click the GREEN box as fast as you can, avoid the RED box!',
+  tic_tac_toe: () => 'Find and click on the winning move for X as fast as you can!',
+};
+
+/**
+ * Human readable text for a click or round result
+ * @param {object} result - Decoded result with a `code`
+ * @returns {string}
+ */
+export const messageForCode = (result) => {
+  const format = RESULT_MESSAGES[result.code];
+  return format ? format(result) : 'Unknown result.';
+};
+
+const fromMs = (ms) => (ms == null ? null : ms / 1000);
+
+const decodeRoundData = (roundData) => {
+  if (!roundData || roundData.instructions) return roundData;
+  const instructions = INSTRUCTIONS[roundData.type];
+  return { ...roundData, instructions: instructions ? instructions(roundData) : '' };
+};
+
+const decodeResult = ([code, success, reactionMs, brightnessError]) => ({
+  code,
+  success: !!success,
+  reaction_time: fromMs(reactionMs),
+  brightness_error: brightnessError,
+});
+
+const decodeLeaderboardEntry = ([playerId, username, avgMs, roundsPlayed, rank]) => ({
+  player_id: playerId,
+  username,
+  avg_time: fromMs(avgMs),
+  rounds_played: roundsPlayed,
+  rank,
+});
+
+export const decodeClickResult = (data) => (Array.isArray(data) ? decodeResult(data) : data);
+
+export const decodeRoundResult = (data) => {
+  if (!Array.isArray(data)) return data;
+  const [roundId, ...result] = data;
+  return { round_id: roundId, result: decodeResult(result) };
+};
+
+export const decodeRoundStart = (data) => {
+  if (!Array.isArray(data)) return data;
+  const [roundId, typeIndex, roundData] = data;
+  return { round_id: roundId, round_type: ROUND_TYPES[typeIndex], round_data: decodeRoundData(roundData) };
+};
+
+export const decodeRoundEnd = (data) => {
+  if (!Array.isArray(data)) return data;
+  const [roundId, baseVersion, version, changed, removed] = data;
+  return {
+    round_id: roundId,
+    leaderboard_delta: {
+      base_version: baseVersion,
+      version,
+      changed: changed.map(decodeLeaderboardEntry),
+      removed,
+    },
+  };
+};
+
+export const decodeRegistrationStatus = (data) => {
+  if (!Array.isArray(data)) return data;
+  const [success, playerId, username, lobbyId, rank, roundInProgress, gameState] = data;
+  const [leaderboardVersion, leaderboard, roundId, typeIndex, roundData] = gameState;
+  const state = {
+    status: roundInProgress ? 'in_progress' : 'waiting',
+    leaderboard: leaderboard.map(decodeLeaderboardEntry),
+    leaderboard_version: leaderboardVersion,
+  };
+  if (typeIndex != null) {
+    Object.assign(state, {
+      round_id: roundId,
+      round_type: ROUND_TYPES[typeIndex],
+      round_data: decodeRoundData(roundData),
+    });
+  }
+  return {
+    success: !!success,
+    player_id: playerId,
+    username,
+    lobby_id: lobbyId,
+    rank,
+    round_in_progress: !!roundInProgress,
+    game_state: state,
+  };
+};